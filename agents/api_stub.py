@@ -0,0 +1,216 @@
+
+# ===================== STUB LOCAL DE L'API CHILL =====================
+# Serveur HTTP minimal qui imite les routes GET de api/src/app.ts utilisées par bigBoy.py.
+# Les réponses portent un ETag et un Last-Modified ; un If-None-Match / If-Modified-Since
+# à jour renvoie 304 sans corps, comme Express.
+#
+# Usage : python api_stub.py --port 8787
+#         CHILL_API_URL=http://127.0.0.1:8787 python bigBoy.py
+import argparse
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TEAMS = [
+    ("Paris Saint-Germain", "PSG", "PSG"),
+    ("Olympique de Marseille", "Marseille", "OM"),
+    ("Olympique Lyonnais", "Lyon", "OL"),
+    ("AS Monaco", "Monaco", "ASM"),
+    ("LOSC Lille", "Lille", "LIL"),
+    ("Stade Rennais", "Rennes", "REN"),
+    ("OGC Nice", "Nice", "NIC"),
+    ("RC Lens", "Lens", "RCL"),
+]
+
+# Noms au format SportRadar "Nom, Prénom", avec accents pour exercer la recherche sans accents
+PLAYER_NAMES = [
+    "Mbappé, Kylian", "Dembélé, Ousmane", "Hakimi, Achraf", "Aubameyang, Pierre-Emerick",
+    "Rongier, Valentin", "Lacazette, Alexandre", "Tolisso, Corentin", "Golovin, Aleksandr",
+    "Ben Seghir, Eliesse", "David, Jonathan", "Zhegrova, Edon", "Bourigeaud, Benjamin",
+    "Terrier, Martin", "Todibo, Jean-Clair", "Thauvin, Florian", "Sotoca, Florian",
+]
+
+def build_fixture(extra_teams: int = 0) -> dict:
+    """Construit un jeu de données cohérent : une saison, ses équipes, leurs joueurs, leurs stats et leurs matchs à venir."""
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    season = {"id": 3, "special_id": "126393", "name": "Ligue 1 25/26", "year": "2025",
+              "start_date": "2025-08-15T00:00:00.000Z", "end_date": "2026-05-30T23:59:59.999Z", "competition_id": "34"}
+    teams = TEAMS + [(f"Team {i}", f"Team {i}", f"T{i}") for i in range(extra_teams)]
+    competitors = []
+    for i, (name, short_name, abbreviation) in enumerate(teams, start=1):
+        competitors.append({"id": i, "special_id": f"{1000 + i}", "name": name, "short_name": short_name,
+                            "abbreviation": abbreviation, "gender": "male", "country": "France",
+                            "country_code": "FRA", "seasonId": season["id"]})
+    statistics = {
+        c["id"]: [{"type": t, "value": float((c["id"] * 7 + k * 3) % 40)}
+                  for k, t in enumerate(("goals_scored", "goals_conceded", "ball_possession", "shots_total"))]
+        for c in competitors
+    }
+    players, player_statistics = [], {}
+    for c in competitors:
+        for k in range(3):
+            index = (c["id"] - 1) * 3 + k
+            name = PLAYER_NAMES[index] if index < len(PLAYER_NAMES) else f"Joueur {index}, Éric"
+            special_id = f"sr:player:{100000 + index}"
+            players.append({"id": index + 1, "special_id": special_id, "name": name, "competitorId": c["id"]})
+            player_statistics[special_id] = [{"type": t, "value": float((index * 5 + j) % 25)}
+                                             for j, t in enumerate(("goals_scored", "assists", "minutes_played"))]
+    matches = []
+    for k in range(len(competitors) * 4):
+        home = competitors[k % len(competitors)]
+        away = competitors[(k * 3 + 1) % len(competitors)]
+        if home["id"] == away["id"]:
+            continue
+        matches.append({"id": k + 1, "special_id": f"{50000 + k}", "home_team": home["name"], "away_team": away["name"],
+                        "start_time": (now + timedelta(hours=6 + 20 * k)).isoformat().replace("+00:00", "Z"),
+                        "venue": None, "status": "scheduled"})
+    return {"seasons": [season], "competitors": competitors, "statistics": statistics, "upcoming_matches": matches,
+            "players": players, "player_statistics": player_statistics}
+
+class ChillApiStub:
+    """Stub démarrable dans un thread ; après une modification de `fixture`, appeler `touch()` pour avancer Last-Modified."""
+
+    def __init__(self, port: int = 0, fixture: dict | None = None):
+        self.fixture = fixture or build_fixture()
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self.request_count = 0
+        self.not_modified_count = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.request_count += 1
+                url = urlparse(self.path)
+                status, body = stub.route(url.path, {k: v[0] for k, v in parse_qs(url.query).items()})
+                payload = json.dumps(body).encode()
+                etag = 'W/"' + hashlib.sha1(payload).hexdigest() + '"'
+                if status == 200 and stub.is_fresh(self.headers, etag):
+                    stub.not_modified_count += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", format_datetime(stub.last_modified, usegmt=True))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ChillApiStub":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def touch(self):
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(seconds=1)
+
+    def is_fresh(self, headers, etag: str) -> bool:
+        if headers.get("If-None-Match"):
+            return headers["If-None-Match"] == etag
+        if headers.get("If-Modified-Since"):
+            try:
+                return parsedate_to_datetime(headers["If-Modified-Since"]) >= self.last_modified
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    # ===================== ROUTES =====================
+    def route(self, path: str, query: dict) -> tuple[int, Any]:
+        parts = [p for p in path.split("/") if p]
+        seasons = self.fixture["seasons"]
+        if parts == ["competitors"]:
+            return 200, self.list_competitors(query)
+        if parts == ["seasons"]:
+            rows = [s for s in seasons if not query.get("year") or s["year"] == query["year"]]
+            if query.get("include_competitors") == "true":
+                rows = [{**s, "competitors": [c for c in self.fixture["competitors"] if c["seasonId"] == s["id"]]} for s in rows]
+            return 200, {"data": rows, "count": len(rows)}
+        if len(parts) == 3 and parts[0] == "seasons" and parts[2] == "upcoming-matches":
+            season = next((s for s in seasons if s["special_id"] == parts[1]), None)
+            if not season:
+                return 404, {"error": "Season not found"}
+            now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            matches = [m for m in self.fixture["upcoming_matches"] if m["start_time"] > now]
+            return 200, {"season": {"id": season["id"], "special_id": season["special_id"], "name": season["name"]},
+                         "upcomingMatchesCount": len(matches), "upcomingMatches": matches}
+        if len(parts) == 5 and parts[0] == "competitors" and parts[2] == "seasons" and parts[4] == "statistics":
+            competitor = self.competitor(parts[1])
+            if not competitor:
+                return 404, {"error": "Competitor not found"}
+            return 200, {"competitor": {"id": competitor["id"], "name": competitor["name"],
+                                        "statistics": self.fixture["statistics"].get(competitor["id"], [])}}
+        if parts == ["players"]:
+            return 200, self.list_players(query)
+        if len(parts) == 3 and parts[0] == "players" and parts[2] == "statistics":
+            if parts[1] not in self.fixture["player_statistics"]:
+                return 404, {"error": "Joueur non trouvé"}
+            return 200, self.fixture["player_statistics"][parts[1]]
+        return 404, {"error": "Not found"}
+
+    def competitor(self, competitor_id: str) -> dict | None:
+        return next((c for c in self.fixture["competitors"] if str(c["id"]) == str(competitor_id)), None)
+
+    def list_competitors(self, query: dict) -> dict:
+        rows = self.fixture["competitors"]
+        if query.get("id"):
+            rows = [c for c in rows if str(c["id"]) == query["id"]]
+        for field in ("name", "short_name"):
+            if query.get(field):
+                rows = [c for c in rows if query[field].lower() in c[field].lower()]
+        if query.get("abbreviation"):
+            rows = [c for c in rows if c["abbreviation"] == query["abbreviation"]]
+        if query.get("include_season") == "true":
+            seasons = {s["id"]: s for s in self.fixture["seasons"]}
+            rows = [{**c, "season": seasons.get(c["seasonId"])} for c in rows]
+        return {"data": rows, "count": len(rows)}
+
+    def list_players(self, query: dict) -> dict:
+        competitors = {c["id"]: c for c in self.fixture["competitors"]}
+        seasons = {s["id"]: s for s in self.fixture["seasons"]}
+        rows = self.fixture["players"]
+        if query.get("special_id"):
+            rows = [p for p in rows if p["special_id"] == query["special_id"]]
+        if query.get("name"):
+            rows = [p for p in rows if query["name"].lower() in p["name"].lower()]
+        if query.get("competitor_id"):
+            rows = [p for p in rows if str(p["competitorId"]) == query["competitor_id"]]
+        if query.get("season_id"):
+            rows = [p for p in rows if str(competitors[p["competitorId"]]["seasonId"]) == query["season_id"]]
+        if query.get("season_special_id"):
+            rows = [p for p in rows
+                    if seasons.get(competitors[p["competitorId"]]["seasonId"], {}).get("special_id") == query["season_special_id"]]
+        if query.get("include_competitor") == "true":
+            rows = [{**p, "competitor": competitors[p["competitorId"]]} for p in rows]
+        rows = sorted(rows, key=lambda p: p["id"], reverse=True)
+        return {"data": rows, "count": len(rows)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local de l'API Chill pour bigBoy.py")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--extra-teams", type=int, default=0, help="Équipes générées en plus des équipes de Ligue 1")
+    args = parser.parse_args()
+    stub = ChillApiStub(port=args.port, fixture=build_fixture(args.extra_teams))
+    print(f"✅ Stub API Chill sur {stub.url}")
+    stub.server.serve_forever()
@@ -1,12 +1,29 @@
 
 # ===================== IMPORTS =====================
 import re
+import asyncio
+import atexit
+import bisect
+import heapq
+import json
+import queue
+import random
+import signal
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict, deque
+from contextvars import ContextVar
 from typing import Any
 from uagents import Agent, Context, Model, Protocol
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from enum import Enum
+from urllib.parse import quote
 from uuid import uuid4
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import httpx
 import openai
 import requests
 import os
@@ -17,11 +34,108 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise RuntimeError("La variable d'environnement OPENAI_API_KEY n'est pas définie. Ajoutez-la dans .env ou exportez-la avant de lancer le script.")
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+# Client asynchrone partagé : un seul pool de connexions HTTP pour tous les appels GPT
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+client = openai.AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY * 2, max_keepalive_connections=LLM_MAX_CONCURRENCY),
+        timeout=httpx.Timeout(30.0, connect=5.0),
+    ),
+)
+# URL de l'API Chill (surchargeable pour pointer vers api_stub.py en local)
+API_BASE_URL = os.getenv("CHILL_API_URL", "https://chillguys.vercel.app").rstrip("/")
+
+# ===================== JOURNALISATION =====================
+# Pipeline non bloquant : les handlers ne font qu'empiler le LogRecord, le formatage
+# (%-args paresseux) et l'écriture sont faits par un QueueListener dans son propre thread.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" ou "json"
+# Taux d'échantillonnage des dumps DEBUG par catégorie, ex: "payload=0.01,competitors=0.1"
+LOG_SAMPLING = {
+    category: float(rate)
+    for category, _, rate in (part.partition("=") for part in os.getenv("LOG_SAMPLING", "payload=0.01,competitors=0.01").split(","))
+    if category
+}
+LOG_FIELDS = ("event", "sender", "msg_id", "intent", "category")
+
+logger = logging.getLogger("bigBoy")
+
+class SamplingFilter(logging.Filter):
+    """Ne laisse passer qu'une fraction des records DEBUG portant une catégorie (extra={"category": ...})."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = getattr(record, "category", None)
+        if category is None or record.levelno > logging.DEBUG:
+            return True
+        return random.random() < LOG_SAMPLING.get(category, 1.0)
+
+class DeferredQueueHandler(QueueHandler):
+    """Contrairement à QueueHandler, ne formate pas le message dans le thread appelant."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par record ; les champs structurés (event, sender...) viennent de `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in LOG_FIELDS:
+            if hasattr(record, field):
+                payload[field] = getattr(record, field)
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+log_listeners: list[tuple[logging.Logger, QueueListener]] = []
+
+def install_log_pipeline(target: logging.Logger):
+    """Remplace les handlers de `target` par une file ; idempotent."""
+    if any(isinstance(handler, DeferredQueueHandler) for handler in target.handlers):
+        return
+    if not target.handlers:
+        default_handler = logging.StreamHandler()
+        default_handler.setFormatter(logging.Formatter("%(levelname)s:     [%(name)s]: %(message)s"))
+        target.addHandler(default_handler)
+    handlers = target.handlers[:]
+    for handler in handlers:
+        target.removeHandler(handler)
+        if LOG_FORMAT == "json":
+            handler.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+    target.addHandler(queue_handler)
+    target.setLevel(LOG_LEVEL)
+    target.propagate = False
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    log_listeners.append((target, listener))
+
+def set_log_level(level: str | int):
+    """Change le niveau de tous les loggers du pipeline, sans redémarrer l'agent."""
+    for target, _ in log_listeners:
+        target.setLevel(level)
+
+def _toggle_debug(signum, frame):
+    # kill -USR1 <pid> : bascule entre LOG_LEVEL et DEBUG
+    debug = any(target.level != logging.DEBUG for target, _ in log_listeners)
+    set_log_level(logging.DEBUG if debug else LOG_LEVEL)
+
+install_log_pipeline(logger)
+if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+    signal.signal(signal.SIGUSR1, _toggle_debug)
 
 # ===================== UTILS API FOOT =====================
 def fetch_team_statistics(competitor_id: str, season_id: str) -> dict:
-    url = f"https://chillguys.vercel.app/competitors/{competitor_id}/seasons/{season_id}/statistics"
+    url = f"{API_BASE_URL}/competitors/{competitor_id}/seasons/{season_id}/statistics"
     try:
         resp = requests.get(url, timeout=10)
         if resp.status_code == 200:
@@ -37,18 +151,21 @@ def fetch_team_id_by_name(team_name: str) -> str | None:
     Recherche robuste : stricte puis partielle, debug print noms trouvés.
     """
     import urllib.parse
-    url = "https://chillguys.vercel.app/competitors"
+    url = f"{API_BASE_URL}/competitors"
     try:
         resp = requests.get(url, timeout=10)
         if resp.status_code != 200:
-            print(f"Erreur lors de la récupération des compétiteurs : {resp.status_code}")
+            logger.error("Erreur lors de la récupération des compétiteurs : %s", resp.status_code)
             return None
         data = resp.json()
         competitors = data.get("data", [])
-        # Debug print des noms trouvés
-        print("fetch_team_id_by_name: Noms disponibles :")
-        for c in competitors:
-            print(f" - name='{c.get('name')}', short_name='{c.get('short_name')}', abbreviation='{c.get('abbreviation')}'")
+        # Dump DEBUG échantillonné des noms trouvés
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "fetch_team_id_by_name: Noms disponibles : %s",
+                [(c.get("name"), c.get("short_name"), c.get("abbreviation")) for c in competitors],
+                extra={"category": "competitors"},
+            )
         # Recherche stricte sur name, short_name, abbreviation (insensible à la casse)
         for c in competitors:
             if c.get("name", "").lower() == team_name.lower():
@@ -65,11 +182,11 @@ def fetch_team_id_by_name(team_name: str) -> str | None:
                 return str(c["id"])
         return None
     except Exception as e:
-        print(f"Erreur fetch_team_id_by_name: {e}")
+        logger.error("Erreur fetch_team_id_by_name: %s", e)
         return None
 
 def fetch_upcoming_matches(season_id: str) -> dict:
-    url = f"https://chillguys.vercel.app/seasons/{season_id}/upcoming-matches"
+    url = f"{API_BASE_URL}/seasons/{season_id}/upcoming-matches"
     try:
         resp = requests.get(url, timeout=10)
         if resp.status_code == 200:
@@ -80,7 +197,7 @@ def fetch_upcoming_matches(season_id: str) -> dict:
         return {"error": str(e)}
 
 def fetch_season_id_by_team_id(team_id: str) -> str | None:
-    url = f"https://chillguys.vercel.app/competitors?id={team_id}&include_season=true"
+    url = f"{API_BASE_URL}/competitors?id={team_id}&include_season=true"
     try:
         resp = requests.get(url, timeout=10)
         if resp.status_code == 200:
@@ -93,7 +210,7 @@ def fetch_season_id_by_team_id(team_id: str) -> str | None:
         return None
 
 def fetch_season_id_by_team_and_year(team_id: str, year: str) -> str | None:
-    url = f"https://chillguys.vercel.app/competitors?id={team_id}&include_season=true"
+    url = f"{API_BASE_URL}/competitors?id={team_id}&include_season=true"
     try:
         resp = requests.get(url, timeout=10)
         if resp.status_code == 200:
@@ -103,7 +220,7 @@ def fetch_season_id_by_team_and_year(team_id: str, year: str) -> str | None:
                 season = competitors[0]["season"]
                 if str(season.get("year")) == str(year):
                     return str(season["special_id"])
-        url2 = f"https://chillguys.vercel.app/seasons?year={year}&include_competitors=true"
+        url2 = f"{API_BASE_URL}/seasons?year={year}&include_competitors=true"
         resp2 = requests.get(url2, timeout=10)
         if resp2.status_code == 200:
             data2 = resp2.json()
@@ -117,7 +234,7 @@ def fetch_season_id_by_team_and_year(team_id: str, year: str) -> str | None:
 
 def fetch_team_id_by_name(team_name: str) -> str | None:
     import urllib.parse
-    url = f"https://chillguys.vercel.app/competitors?name={urllib.parse.quote(team_name)}"
+    url = f"{API_BASE_URL}/competitors?name={urllib.parse.quote(team_name)}"
     try:
         resp = requests.get(url, timeout=10)
         if resp.status_code == 200:
@@ -126,7 +243,7 @@ def fetch_team_id_by_name(team_name: str) -> str | None:
             for c in competitors:
                 if c.get("name", "").lower() == team_name.lower():
                     return str(c["id"])
-            url2 = f"https://chillguys.vercel.app/competitors?short_name={urllib.parse.quote(team_name)}"
+            url2 = f"{API_BASE_URL}/competitors?short_name={urllib.parse.quote(team_name)}"
             resp2 = requests.get(url2, timeout=10)
             if resp2.status_code == 200:
                 data2 = resp2.json()
@@ -134,7 +251,7 @@ def fetch_team_id_by_name(team_name: str) -> str | None:
                 for c in competitors2:
                     if c.get("short_name", "").lower() == team_name.lower():
                         return str(c["id"])
-            url3 = f"https://chillguys.vercel.app/competitors?abbreviation={urllib.parse.quote(team_name)}"
+            url3 = f"{API_BASE_URL}/competitors?abbreviation={urllib.parse.quote(team_name)}"
             resp3 = requests.get(url3, timeout=10)
             if resp3.status_code == 200:
                 data3 = resp3.json()
@@ -150,7 +267,7 @@ def fetch_team_id_by_name(team_name: str) -> str | None:
         return None
 
 def fetch_upcoming_matches(season_id: str) -> dict:
-    url = f"https://chillguys.vercel.app/seasons/{season_id}/upcoming-matches"
+    url = f"{API_BASE_URL}/seasons/{season_id}/upcoming-matches"
     try:
         resp = requests.get(url, timeout=10)
         if resp.status_code == 200:
@@ -161,7 +278,7 @@ def fetch_upcoming_matches(season_id: str) -> dict:
         return {"error": str(e)}
 
 def fetch_season_id_by_team_id(team_id: str) -> str | None:
-    url = f"https://chillguys.vercel.app/competitors?id={team_id}&include_season=true"
+    url = f"{API_BASE_URL}/competitors?id={team_id}&include_season=true"
     try:
         resp = requests.get(url, timeout=10)
         if resp.status_code == 200:
@@ -174,7 +291,7 @@ def fetch_season_id_by_team_id(team_id: str) -> str | None:
         return None
 
 def fetch_season_id_by_team_and_year(team_id: str, year: str) -> str | None:
-    url = f"https://chillguys.vercel.app/competitors?id={team_id}&include_season=true"
+    url = f"{API_BASE_URL}/competitors?id={team_id}&include_season=true"
     try:
         resp = requests.get(url, timeout=10)
         if resp.status_code == 200:
@@ -184,7 +301,7 @@ def fetch_season_id_by_team_and_year(team_id: str, year: str) -> str | None:
                 season = competitors[0]["season"]
                 if str(season.get("year")) == str(year):
                     return str(season["special_id"])
-        url2 = f"https://chillguys.vercel.app/seasons?year={year}&include_competitors=true"
+        url2 = f"{API_BASE_URL}/seasons?year={year}&include_competitors=true"
         resp2 = requests.get(url2, timeout=10)
         if resp2.status_code == 200:
             data2 = resp2.json()
@@ -196,172 +313,1256 @@ def fetch_season_id_by_team_and_year(team_id: str, year: str) -> str | None:
     except Exception:
         return None
 
-# ===================== LOGIQUE CHATBOT =====================
-def generate_direct_response(text: str) -> str:
-    lower = text.lower()
-    # Stats récentes/actuelles d'une équipe (ex: 'stats les plus récentes du PSG', 'stats actuelles OM')
-    m_recent = re.search(r"stat[s]? (?:les plus récentes|actuelle[s]?|du moment|derni[eè]re[s]?) (?:du|de|d'|de l'|de la|des)?\s*([\w\d\s'-]+)", lower)
-    if m_recent:
-        team_part = m_recent.group(1).strip(" -'")
-        if team_part.isdigit():
-            competitor_id = team_part
-        else:
-            competitor_id = fetch_team_id_by_name(team_part)
-            if not competitor_id:
-                return f"Impossible de trouver l'équipe '{team_part}'. Vérifie le nom."
-        url = f"https://chillguys.vercel.app/competitors?id={competitor_id}&include_season=true"
+# ===================== SYNCHRO DES DONNÉES DE RÉFÉRENCE =====================
+# Intervalle minimal (secondes) entre deux vérifications conditionnelles d'une collection
+REFERENCE_SYNC_INTERVAL = int(os.getenv("REFERENCE_SYNC_INTERVAL", "600"))
+# Premier délai avant de retenter une collection en échec (doublé à chaque échec, plafonné à l'intervalle)
+REFERENCE_RETRY_MIN = int(os.getenv("REFERENCE_RETRY_MIN", "30"))
+
+class ReferenceDataSync:
+    """
+    Copie locale de /competitors et /seasons, rafraîchie par requêtes conditionnelles
+    (If-None-Match / If-Modified-Since). Un 304 ne coûte qu'un aller-retour sans corps ;
+    sur un 200, seules les lignes modifiées ou supprimées sont réappliquées aux index.
+    """
+
+    COLLECTIONS = {
+        "competitors": "/competitors?include_season=true",
+        "seasons": "/seasons",
+    }
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.rows: dict[str, dict[int, dict]] = {name: {} for name in self.COLLECTIONS}
+        self._validators: dict[str, dict[str, str]] = {name: {} for name in self.COLLECTIONS}
+        # Prochaine vérification par collection, repoussée aussi après un échec (API injoignable)
+        self._next_check_at: dict[str, float] = {}
+        self._failures: dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Index dérivés : nom / short_name / abbreviation (minuscules) -> id du competitor
+        self.by_name: dict[str, int] = {}
+        self.by_short_name: dict[str, int] = {}
+        self.by_abbreviation: dict[str, int] = {}
+        # Fonctions appelées avec (collection, id) pour chaque ligne modifiée ou supprimée
+        self.listeners: list = []
+
+    def refresh(self, force: bool = False) -> dict[str, int]:
+        """Synchronise les collections périmées ; renvoie le nombre de lignes appliquées par collection."""
+        applied = {}
+        with self._lock:
+            for name, path in self.COLLECTIONS.items():
+                if not force and time.monotonic() < self._next_check_at.get(name, 0):
+                    continue
+                applied[name] = self._refresh_collection(name, path)
+        return applied
+
+    def _refresh_collection(self, name: str, path: str) -> int:
+        validators = self._validators[name]
+        headers = {}
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
         try:
-            resp = requests.get(url, timeout=10)
-            if resp.status_code == 200:
-                data = resp.json()
-                competitors = data.get("data", [])
-                if competitors and competitors[0].get("season"):
-                    season = competitors[0]["season"]
-                    season_id = str(season["special_id"])
-                    year = season.get("year")
-                    data_stats = fetch_team_statistics(competitor_id, season_id)
-                    if "error" in data_stats:
-                        return f"Erreur lors de la récupération des stats: {data_stats['error']}"
-                    stats = data_stats.get("competitor", {}).get("statistics", [])
-                    if not stats:
-                        return f"Aucune statistique trouvée pour {team_part} (saison {year})."
-                    lines = [f"Statistiques les plus récentes pour l'équipe {team_part} (saison {year}):"]
-                    for stat in stats:
-                        lines.append(f"- {stat.get('type', 'Type inconnu')}: {stat.get('value', 'N/A')}")
-                    return "\n".join(lines)
-        except Exception:
-            return f"Impossible de récupérer la saison la plus récente pour l'équipe '{team_part}'."
-        return f"Impossible de trouver la saison la plus récente pour l'équipe '{team_part}'."
-    # Stats équipe + saison (ex: 'stats du PSG saison 3')
-    m = re.search(r"stat[s]?\s*(?:du|de|d'|de l'|de la|de les|des)?\s*([\w\d\s'-]+?)\s*(?:équipe)?\s*saison\s*(\d+)", lower)
-    if m:
-        team_part, season_id = m.group(1).strip(), m.group(2)
-        team_part = team_part.strip(" -'")
-        if team_part.isdigit():
-            competitor_id = team_part
-        else:
-            competitor_id = fetch_team_id_by_name(team_part)
-            if not competitor_id:
-                return f"Impossible de trouver l'équipe '{team_part}'. Vérifie le nom."
-        data = fetch_team_statistics(competitor_id, season_id)
-        if "error" in data:
-            return f"Erreur lors de la récupération des stats: {data['error']}"
-        stats = data.get("competitor", {}).get("statistics", [])
-        if not stats:
-            return "Aucune statistique trouvée pour cette équipe/saison."
-        lines = [f"Statistiques principales pour l'équipe {team_part} (saison {season_id}):"]
-        for stat in stats:
-            lines.append(f"- {stat.get('type', 'Type inconnu')}: {stat.get('value', 'N/A')}")
-        return "\n".join(lines)
-    # Stats équipe + année (ex: 'stats du PSG en 2025')
-    m_year = re.search(r"stat[s]?\s*(?:du|de|d'|de l'|de la|de les|des)?\s*([\w\d\s'-]+?)\s*(?:équipe)?\s*(?:en|pour|année|an)\s*(\d{4})", lower)
-    if m_year:
-        team_part, year = m_year.group(1).strip(), m_year.group(2)
-        team_part = team_part.strip(" -'")
-        if team_part.isdigit():
-            competitor_id = team_part
-        else:
-            competitor_id = fetch_team_id_by_name(team_part)
-            if not competitor_id:
-                return f"Impossible de trouver l'équipe '{team_part}'. Vérifie le nom."
-        season_id = fetch_season_id_by_team_and_year(competitor_id, year)
-        if not season_id:
-            return f"Impossible de trouver la saison {year} pour l'équipe '{team_part}'."
-        data = fetch_team_statistics(competitor_id, season_id)
-        if "error" in data:
-            return f"Erreur lors de la récupération des stats: {data['error']}"
-        stats = data.get("competitor", {}).get("statistics", [])
-        if not stats:
-            return f"Aucune statistique trouvée pour {team_part} en {year}."
-        lines = [f"Statistiques principales pour l'équipe {team_part} en {year}:"]
-        for stat in stats:
-            lines.append(f"- {stat.get('type', 'Type inconnu')}: {stat.get('value', 'N/A')}")
+            resp = self.session.get(f"{self.base_url}{path}", headers=headers, timeout=10)
+        except Exception as e:
+            self._backoff(name)
+            logger.warning("Erreur synchro %s: %s", name, e)
+            return 0
+        if resp.status_code not in (200, 304):
+            self._backoff(name)
+            logger.warning("Erreur synchro %s: %s", name, resp.status_code)
+            return 0
+        self._failures.pop(name, None)
+        self._next_check_at[name] = time.monotonic() + REFERENCE_SYNC_INTERVAL
+        if resp.status_code == 304:
+            return 0
+        if resp.headers.get("ETag"):
+            validators["etag"] = resp.headers["ETag"]
+        if resp.headers.get("Last-Modified"):
+            validators["last_modified"] = resp.headers["Last-Modified"]
+        fresh = {int(row["id"]): row for row in resp.json().get("data", []) if row.get("id") is not None}
+        return self._apply(name, fresh)
+
+    def _backoff(self, name: str):
+        failures = self._failures.get(name, 0) + 1
+        self._failures[name] = failures
+        self._next_check_at[name] = time.monotonic() + min(REFERENCE_RETRY_MIN * 2 ** (failures - 1), REFERENCE_SYNC_INTERVAL)
+
+    def _apply(self, name: str, fresh: dict[int, dict]) -> int:
+        """
+        Applique les lignes modifiées/supprimées sur des copies puis les remplace d'un bloc :
+        les lectures faites depuis la boucle d'événements (team_id, competitor, season_of)
+        ne voient jamais un dict en cours de modification par le thread de synchro.
+        """
+        current = self.rows[name]
+        removed = [row_id for row_id in current if row_id not in fresh]
+        changed = [row_id for row_id, row in fresh.items() if current.get(row_id) != row]
+        if not removed and not changed:
+            return 0
+        rows = dict(current)
+        for row_id in removed:
+            del rows[row_id]
+        for row_id in changed:
+            rows[row_id] = fresh[row_id]
+        if name == "competitors":
+            indexes = (dict(self.by_name), dict(self.by_short_name), dict(self.by_abbreviation))
+            for row_id in removed + changed:
+                if row_id in current:
+                    self._unindex_competitor(current[row_id], indexes)
+            for row_id in changed:
+                self._index_competitor(fresh[row_id], indexes)
+            self.by_name, self.by_short_name, self.by_abbreviation = indexes
+        self.rows = {**self.rows, name: rows}
+        for row_id in removed + changed:
+            for listener in self.listeners:
+                listener(name, row_id)
+        return len(removed) + len(changed)
+
+    @staticmethod
+    def _index_competitor(row: dict, indexes: tuple[dict, dict, dict]):
+        for field, index in zip(("name", "short_name", "abbreviation"), indexes):
+            if row.get(field):
+                index[row[field].lower()] = int(row["id"])
+
+    @staticmethod
+    def _unindex_competitor(row: dict, indexes: tuple[dict, dict, dict]):
+        for field, index in zip(("name", "short_name", "abbreviation"), indexes):
+            if row.get(field) and index.get(row[field].lower()) == int(row["id"]):
+                del index[row[field].lower()]
+
+    def team_id(self, team_name: str) -> str | None:
+        """Même ordre de priorité que fetch_team_id_by_name : name, short_name, abbreviation, puis partiel."""
+        key = team_name.lower()
+        for index in (self.by_name, self.by_short_name, self.by_abbreviation):
+            if key in index:
+                return str(index[key])
+        for row in self.rows["competitors"].values():
+            if key in (row.get("name") or "").lower() or key in (row.get("short_name") or "").lower():
+                return str(row["id"])
+        return None
+
+    def competitor(self, competitor_id: str) -> dict | None:
+        if not str(competitor_id).isdigit():
+            return None
+        return self.rows["competitors"].get(int(competitor_id))
+
+    def season_of(self, competitor_id: str) -> dict | None:
+        competitor = self.competitor(competitor_id)
+        if not competitor:
+            return None
+        return competitor.get("season") or self.rows["seasons"].get(competitor.get("seasonId"))
+
+reference_data = ReferenceDataSync(API_BASE_URL)
+
+def resolve_team_id(team_name: str) -> str | None:
+    """
+    Résout un nom d'équipe via la copie locale, puis via l'API si elle ne connaît pas le nom.
+    Les résolveurs ne rafraîchissent jamais la copie eux-mêmes : c'est le rôle de sync_reference_data.
+    """
+    return reference_data.team_id(team_name) or fetch_team_id_by_name(team_name)
+
+def resolve_season_id(competitor_id: str) -> str | None:
+    season = reference_data.season_of(competitor_id)
+    if season:
+        return str(season["special_id"])
+    return fetch_season_id_by_team_id(competitor_id)
+
+def resolve_season_id_by_year(competitor_id: str, year: str) -> str | None:
+    season = reference_data.season_of(competitor_id)
+    if season and str(season.get("year")) == str(year):
+        return str(season["special_id"])
+    return fetch_season_id_by_team_and_year(competitor_id, year)
+
+def resolve_season(competitor_id: str) -> dict | None:
+    """Saison courante du competitor (avec son année) : copie locale, sinon /competitors?include_season=true."""
+    season = reference_data.season_of(competitor_id)
+    if season:
+        return season
+    try:
+        resp = requests.get(f"{API_BASE_URL}/competitors?id={competitor_id}&include_season=true", timeout=10)
+        if resp.status_code == 200:
+            competitors = resp.json().get("data", [])
+            if competitors and competitors[0].get("season"):
+                return competitors[0]["season"]
+    except Exception:
+        pass
+    return None
+
+# ===================== INDEX DES MATCHS À VENIR =====================
+# Durée (secondes) pendant laquelle les matchs à venir d'une saison sont considérés à jour
+UPCOMING_INDEX_TTL = int(os.getenv("UPCOMING_INDEX_TTL", "300"))
+
+def _parse_start_time(value) -> datetime | None:
+    try:
+        start = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    return start
+
+class UpcomingMatchIndex:
+    """
+    Index équipe -> matchs à venir triés par start_time, toutes saisons confondues.
+    Les clés sont l'id du competitor (int) et son nom en minuscules, car l'API
+    ne renvoie pas toujours home_competitor/away_competitor.
+    """
+
+    def __init__(self):
+        self._by_season: dict[str, list[dict]] = {}
+        self._refreshed_at: dict[str, float] = {}
+        # clé -> (timestamps triés, matchs dans le même ordre)
+        self._by_team: dict[Any, tuple[list[float], list[dict]]] = {}
+        # Sérialise les écritures (boucle, pré-calcul et rappels en threads) ; les lectures restent sans verrou
+        self._lock = threading.Lock()
+
+    def is_fresh(self, season_id: str) -> bool:
+        refreshed_at = self._refreshed_at.get(str(season_id))
+        return refreshed_at is not None and time.monotonic() - refreshed_at < UPCOMING_INDEX_TTL
+
+    def season_matches(self, season_id: str) -> list[dict]:
+        return self._by_season.get(str(season_id), [])
+
+    def refresh_season(self, season_id: str, matches: list[dict]):
+        """
+        Remplace les matchs d'une saison puis reconstruit l'index par équipe, sur des copies
+        remplacées d'un bloc : les lectures concurrentes ne voient jamais un dict en cours de modification.
+        """
+        with self._lock:
+            self._refresh_season(str(season_id), matches)
+
+    def _refresh_season(self, season_id: str, matches: list[dict]):
+        by_season = {**self._by_season, season_id: matches}
+        entries: dict[Any, list[tuple[float, dict]]] = {}
+        for season_matches in by_season.values():
+            for match in season_matches:
+                start = _parse_start_time(match.get("start_time"))
+                if start is None:
+                    continue
+                for key in self._keys_for(match):
+                    entries.setdefault(key, []).append((start.timestamp(), match))
+        by_team = {}
+        for key, items in entries.items():
+            items.sort(key=lambda item: item[0])
+            by_team[key] = ([ts for ts, _ in items], [match for _, match in items])
+        self._by_season = by_season
+        self._by_team = by_team
+        self._refreshed_at = {**self._refreshed_at, season_id: time.monotonic()}
+
+    @staticmethod
+    def _keys_for(match: dict) -> set:
+        keys = set()
+        for side in ("home", "away"):
+            competitor = match.get(f"{side}_competitor") or {}
+            if competitor.get("id") is not None:
+                keys.add(int(competitor["id"]))
+            if match.get(f"{side}_team"):
+                keys.add(str(match[f"{side}_team"]).lower())
+        return keys
+
+    def _lookup(self, competitor_id: str | None, team_name: str | None) -> tuple[list[float], list[dict]]:
+        if competitor_id is not None and str(competitor_id).isdigit():
+            found = self._by_team.get(int(competitor_id))
+            if found:
+                return found
+        if team_name:
+            found = self._by_team.get(team_name.lower())
+            if found:
+                return found
+        return [], []
+
+    def next_matches(self, competitor_id: str | None, team_name: str | None = None, n: int = 1, now: datetime | None = None) -> list[dict]:
+        """Renvoie les n prochains matchs de l'équipe (les matchs passés sont sautés par bisection)."""
+        timestamps, matches = self._lookup(competitor_id, team_name)
+        now = now or datetime.now(timezone.utc)
+        start = bisect.bisect_right(timestamps, now.timestamp())
+        return matches[start:start + n]
+
+    def matches_between(self, competitor_id: str | None, team_name: str | None, start: datetime, end: datetime) -> list[dict]:
+        """Renvoie les matchs de l'équipe dont le coup d'envoi est dans [start, end]."""
+        timestamps, matches = self._lookup(competitor_id, team_name)
+        lo = bisect.bisect_left(timestamps, start.timestamp())
+        hi = bisect.bisect_right(timestamps, end.timestamp())
+        return matches[lo:hi]
+
+upcoming_index = UpcomingMatchIndex()
+
+def refresh_upcoming_index(season_id: str, force: bool = False) -> dict:
+    """
+    Recharge les matchs à venir d'une saison dans l'index si besoin.
+    Renvoie {"upcomingMatches": [...]} ou {"error": ...} comme fetch_upcoming_matches.
+    """
+    season_id = str(season_id)
+    if not force and upcoming_index.is_fresh(season_id):
+        return {"upcomingMatches": upcoming_index.season_matches(season_id)}
+    data = fetch_upcoming_matches(season_id)
+    if "error" not in data:
+        upcoming_index.refresh_season(season_id, data.get("upcomingMatches", []))
+        answer_cache.invalidate("matches")
+        match_reminders.schedule_matches(season_id, data.get("upcomingMatches", []))
+    return data
+
+def fetch_team_official_name(competitor_id: str) -> str | None:
+    competitor = reference_data.competitor(competitor_id)
+    if competitor and competitor.get("name"):
+        return competitor["name"]
+    url = f"{API_BASE_URL}/competitors?id={competitor_id}"
+    try:
+        resp = requests.get(url, timeout=10)
+        if resp.status_code == 200:
+            competitors = resp.json().get("data", [])
+            if competitors:
+                return competitors[0].get("name")
+    except Exception:
+        pass
+    return None
+
+def format_match(match: dict) -> str:
+    return f"{match.get('home_team','?')} vs {match.get('away_team','?')} le {match.get('start_time','?')}"
+
+def answer_team_upcoming(team_part: str, competitor_id: str, season_id: str, n: int = 1, this_week: bool = False) -> str:
+    """Formate le prochain match, les n prochains matchs ou les matchs de la semaine d'une équipe."""
+    data = refresh_upcoming_index(season_id)
+    if "error" in data:
+        return f"Erreur lors de la récupération des matchs: {data['error']}"
+    team_name_official = fetch_team_official_name(competitor_id) or team_part
+    if this_week:
+        now = datetime.now(timezone.utc)
+        end_of_week = (now + timedelta(days=6 - now.weekday())).replace(hour=23, minute=59, second=59, microsecond=0)
+        matches = upcoming_index.matches_between(competitor_id, team_name_official, now, end_of_week)
+        if not matches:
+            return f"Aucun match cette semaine pour {team_name_official}."
+        lines = [f"Matchs de {team_name_official} cette semaine:"]
+    else:
+        matches = upcoming_index.next_matches(competitor_id, team_name_official, n=n)
+        if not matches:
+            return f"Aucun match à venir trouvé pour {team_name_official}."
+        if n == 1:
+            return f"Prochain match de {team_name_official}: {format_match(matches[0])}"
+        lines = [f"Prochains matchs de {team_name_official}:"]
+    for match in matches:
+        lines.append(f"- {format_match(match)}")
+    return "\n".join(lines)
+
+def answer_team_stats(competitor_id: str, season_id: str, title: str, empty: str) -> str:
+    data = fetch_team_statistics(competitor_id, season_id)
+    if "error" in data:
+        return f"Erreur lors de la récupération des stats: {data['error']}"
+    stats = data.get("competitor", {}).get("statistics", [])
+    answer_cache.note_statistics(competitor_id, season_id, stats)
+    if not stats:
+        return empty
+    lines = [f"{title}:"]
+    for stat in stats:
+        lines.append(f"- {stat.get('type', 'Type inconnu')}: {stat.get('value', 'N/A')}")
+    return "\n".join(lines)
+
+# ===================== INDEX DES JOUEURS =====================
+# Intervalle minimal (secondes) entre deux rechargements conditionnels des joueurs d'une saison
+PLAYER_INDEX_TTL = int(os.getenv("PLAYER_INDEX_TTL", "900"))
+# Durée de vie des stats d'un joueur en cache (recalculées côté API par le cron)
+PLAYER_STATS_TTL = int(os.getenv("PLAYER_STATS_TTL", "900"))
+# Longueur minimale d'un nom pour une recherche par préfixe (en dessous : correspondance exacte)
+PLAYER_PREFIX_MIN_CHARS = 3
+
+PLAYER_STATS_RE = re.compile(r"stat[s]?\s*(?:les plus récentes|actuelle[s]?|du moment|derni[eè]re[s]?)?\s*(?:du joueur|de la joueuse|du|de|d'|des)?\s*([\w\s'.-]+?)\s*(?:saison\s*(\d+))?$")
+
+def fold_name(value: str) -> str:
+    """Minuscules, sans accents ni ponctuation : "Mbappé, Kylian" -> "mbappe kylian"."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", stripped.lower()).split())
+
+def player_display_name(player: dict) -> str:
+    """Les noms SportRadar sont au format "Nom, Prénom" : on affiche "Prénom Nom"."""
+    last, _, first = str(player.get("name", "?")).partition(",")
+    return f"{first.strip()} {last.strip()}".strip()
+
+class PlayerIndex:
+    """
+    Joueurs chargés en bloc par saison (/players?season_id=..., requêtes conditionnelles)
+    et index de recherche par préfixe sur les noms sans accents : une liste triée de clés
+    (nom complet, "prénom nom" et chaque mot du nom) parcourue par bisection.
+    Les stats sont gardées par (joueur, saison) pendant PLAYER_STATS_TTL.
+    Le rechargement (thread du job planifié) travaille sur des copies de players/season_of/_keys,
+    remplacées chacune d'une seule affectation : search() lit sans verrou depuis la boucle.
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.players: dict[str, dict] = {}
+        self.season_of: dict[str, str] = {}
+        self._season_players: dict[str, set[str]] = {}
+        self._validators: dict[str, dict[str, str]] = {}
+        self._checked_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+        # (clés triées, special_id du joueur pour chaque clé), remplacés d'un bloc à chaque reconstruction
+        self._keys: tuple[list[str], list[str]] = ([], [])
+        self._stats: dict[tuple[str, str], tuple[float, list[dict]]] = {}
+
+    @staticmethod
+    def known_seasons() -> set[str]:
+        """Seules les saisons de la copie locale de /seasons sont chargées (jamais un numéro tapé par un utilisateur)."""
+        return {str(season_id) for season_id in reference_data.rows["seasons"]}
+
+    def refresh(self, force: bool = False) -> dict[str, int]:
+        """Recharge les saisons connues ; renvoie les lignes appliquées par saison."""
+        reference_data.refresh()
+        seasons = self.known_seasons()
+        applied = {}
+        with self._lock:
+            players, season_of = dict(self.players), dict(self.season_of)
+            for season_id in set(self._season_players) - seasons:
+                applied[season_id] = self._drop_season(season_id, players, season_of)
+            for season_id in sorted(seasons):
+                checked_at = self._checked_at.get(season_id)
+                if not force and checked_at is not None and time.monotonic() - checked_at < PLAYER_INDEX_TTL:
+                    continue
+                applied[season_id] = self._refresh_season(season_id, players, season_of)
+            if any(applied.values()):
+                keys = self._build_keys(players)
+                self.players = players
+                self.season_of = season_of
+                self._keys = keys
+        return applied
+
+    def _refresh_season(self, season_id: str, players: dict[str, dict], season_of: dict[str, str]) -> int:
+        validators = self._validators.setdefault(season_id, {})
+        headers = {}
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+        try:
+            resp = self.session.get(f"{self.base_url}/players", params={"season_id": season_id},
+                                    headers=headers, timeout=10)
+        except Exception as e:
+            logger.warning("Erreur chargement joueurs saison %s: %s", season_id, e)
+            return 0
+        self._checked_at[season_id] = time.monotonic()
+        if resp.status_code == 304:
+            return 0
+        if resp.status_code != 200:
+            logger.warning("Erreur chargement joueurs saison %s: %s", season_id, resp.status_code)
+            return 0
+        if resp.headers.get("ETag"):
+            validators["etag"] = resp.headers["ETag"]
+        if resp.headers.get("Last-Modified"):
+            validators["last_modified"] = resp.headers["Last-Modified"]
+        fresh = {str(row["special_id"]): row for row in resp.json().get("data", []) if row.get("special_id")}
+        current = self._season_players.get(season_id, set())
+        removed = [special_id for special_id in current if special_id not in fresh]
+        changed = [special_id for special_id, row in fresh.items() if players.get(special_id) != row]
+        for special_id in removed:
+            players.pop(special_id, None)
+            season_of.pop(special_id, None)
+        for special_id in changed:
+            players[special_id] = fresh[special_id]
+            season_of[special_id] = season_id
+        self._season_players[season_id] = set(fresh)
+        for special_id in removed + changed:
+            self._stats.pop((special_id, season_id), None)
+            answer_cache.invalidate("player", special_id)
+        return len(removed) + len(changed)
+
+    def _drop_season(self, season_id: str, players: dict[str, dict], season_of: dict[str, str]) -> int:
+        """Oublie une saison disparue de /seasons et ses joueurs."""
+        removed = self._season_players.pop(season_id, set())
+        self._checked_at.pop(season_id, None)
+        self._validators.pop(season_id, None)
+        for special_id in removed:
+            players.pop(special_id, None)
+            season_of.pop(special_id, None)
+            self._stats.pop((special_id, season_id), None)
+            answer_cache.invalidate("player", special_id)
+        return len(removed)
+
+    @staticmethod
+    def _build_keys(players: dict[str, dict]) -> tuple[list[str], list[str]]:
+        entries = []
+        for special_id, player in players.items():
+            name = str(player.get("name", ""))
+            last, _, first = name.partition(",")
+            keys = {fold_name(name), fold_name(f"{first} {last}")}
+            keys.update(word for word in fold_name(name).split() if len(word) > 1)
+            entries.extend((key, special_id) for key in keys if key)
+        entries.sort()
+        return [key for key, _ in entries], [special_id for _, special_id in entries]
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._checked_at)
+
+    def search(self, query: str, season_id: str | None = None, limit: int = 5) -> list[dict]:
+        """
+        Joueurs dont le nom (ou un mot du nom) vaut `query` ; à défaut, ceux qui commencent par `query`.
+        Les saisons les plus récentes passent en premier.
+        """
+        folded = fold_name(query)
+        if not folded:
+            return []
+        # Références prises une fois : un rechargement concurrent remplace les dicts sans les modifier
+        keys, special_ids = self._keys
+        players, season_of = self.players, self.season_of
+        lo = bisect.bisect_left(keys, folded)
+        hi = bisect.bisect_right(keys, folded + "\uffff" if len(folded) >= PLAYER_PREFIX_MIN_CHARS else folded)
+        exact, prefix = {}, {}
+        for i in range(lo, hi):
+            (exact if keys[i] == folded else prefix)[special_ids[i]] = None
+        found = [special_id for special_id in (exact or prefix)
+                 if special_id in players and special_id in season_of
+                 and (season_id is None or season_of[special_id] == str(season_id))]
+        found.sort(key=lambda special_id: (-int(season_of[special_id]) if season_of[special_id].isdigit() else 0,
+                                           len(players[special_id].get("name", ""))))
+        return [players[special_id] for special_id in found[:limit]]
+
+    def statistics(self, special_id: str, season_id: str) -> dict:
+        """Stats du joueur via /players/:special_id/statistics, en cache par (joueur, saison)."""
+        key = (str(special_id), str(season_id))
+        entry = self._stats.get(key)
+        if entry is not None and time.monotonic() < entry[0]:
+            return {"statistics": entry[1]}
+        url = f"{self.base_url}/players/{quote(str(special_id), safe=':')}/statistics"
+        try:
+            resp = self.session.get(url, timeout=10)
+            if resp.status_code != 200:
+                return {"error": f"Erreur API: {resp.status_code}"}
+            stats = resp.json()
+        except Exception as e:
+            return {"error": str(e)}
+        self._stats[key] = (time.monotonic() + PLAYER_STATS_TTL, stats)
+        return {"statistics": stats}
+
+player_index = PlayerIndex(API_BASE_URL)
+
+def match_player_query(lower: str) -> tuple[str, str | None, list[dict]] | None:
+    """
+    Intent "stats de Mbappé (saison 3)" : renvoie (nom demandé, saison, joueurs trouvés).
+    Seul l'index déjà chargé est consulté (le chargement en bloc passe par sync_player_index) :
+    aucune requête ni attente de verrou sur le chemin du message. Un joueur connu demandé pour
+    une saison sans données renvoie une liste vide ; None si aucun joueur ne correspond.
+    Les noms d'équipe connus restent aux intents équipe.
+    """
+    m = PLAYER_STATS_RE.search(normalize_query(lower))
+    if not m:
+        return None
+    name_part, season_id = m.group(1).strip(" -'."), m.group(2)
+    if not name_part or name_part.isdigit() or name_part.startswith("équipe") or reference_data.team_id(name_part):
+        return None
+    players = player_index.search(name_part, season_id)
+    if not players and (season_id is None or not player_index.search(name_part)):
+        return None
+    return name_part, season_id, players
+
+def answer_players(name_part: str, players: list[dict]) -> str:
+    """Stats du joueur trouvé, ou liste des candidats quand le nom est ambigu."""
+    if not players:
+        return f"Impossible de trouver le joueur '{name_part}'. Vérifie le nom."
+    if len(players) > 1:
+        lines = [f"Plusieurs joueurs correspondent à '{name_part}', précise le nom :"]
+        for player in players:
+            team = reference_data.competitor(player.get("competitorId")) or {}
+            lines.append(f"- {player_display_name(player)} ({team.get('name', '?')}, saison {player_index.season_of.get(player['special_id'], '?')})")
         return "\n".join(lines)
-    # Ancienne syntaxe : "stats équipe PSG saison 3"
-    m2 = re.search(r"équipe\s*([\w\d\s]+).*saison\s*(\d+)", lower)
-    if m2:
-        team_part, season_id = m2.group(1).strip(), m2.group(2)
-        if team_part.isdigit():
-            competitor_id = team_part
+    player = players[0]
+    season_id = player_index.season_of.get(player["special_id"], "?")
+    data = player_index.statistics(player["special_id"], season_id)
+    if "error" in data:
+        return f"Erreur lors de la récupération des stats: {data['error']}"
+    team = reference_data.competitor(player.get("competitorId")) or {}
+    context = f"{team['name']}, saison {season_id}" if team.get("name") else f"saison {season_id}"
+    if not data["statistics"]:
+        return f"Aucune statistique trouvée pour {player_display_name(player)} ({context})."
+    lines = [f"Statistiques de {player_display_name(player)} ({context}):"]
+    for stat in data["statistics"]:
+        lines.append(f"- {stat.get('type', 'Type inconnu')}: {stat.get('value', 'N/A')}")
+    return "\n".join(lines)
+
+# ===================== PROFILAGE DES MESSAGES LENTS =====================
+# Mode opt-in : PROFILE_MESSAGES=1 active un échantillonneur de piles sur le thread de la boucle
+PROFILE_MESSAGES = os.getenv("PROFILE_MESSAGES", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))  # part de messages profilés au hasard
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "2000"))  # tout message plus lent est profilé
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+# Intent du message en cours, posé par answer_message / ask_llm (une valeur par tâche asyncio)
+current_intent: ContextVar[str] = ContextVar("current_intent", default="inconnu")
+
+class MessageProfiler:
+    """
+    Échantillonne la pile du thread de la boucle asyncio tant qu'au moins un message est
+    en cours, dans un buffer circulaire. À la fin d'un message tiré au sort ou plus lent
+    que PROFILE_SLOW_MS, les échantillons de sa fenêtre sont écrits au format "folded"
+    (flamegraph.pl, speedscope) par le thread d'échantillonnage, jamais par la boucle.
+    Les messages concurrents partagent la boucle : la fenêtre d'un message peut donc
+    contenir des piles d'autres tâches.
+    """
+
+    def __init__(self):
+        self.samples: deque[tuple[float, str]] = deque()
+        self._in_flight = 0
+        self._target_thread: int | None = None
+        self._thread: threading.Thread | None = None
+        # Profils à écrire : (début, fin, durée ms, raison, msg_id, intent, chemin)
+        self._pending: queue.SimpleQueue = queue.SimpleQueue()
+
+    def begin(self) -> float:
+        if self._thread is None:
+            self._target_thread = threading.get_ident()
+            self._thread = threading.Thread(target=self._run, name="message-profiler", daemon=True)
+            self._thread.start()
+        self._in_flight += 1
+        return time.monotonic()
+
+    def end(self, started: float, msg_id: str) -> str | None:
+        """
+        Termine le suivi d'un message ; si son profil est retenu, confie l'écriture au thread
+        d'échantillonnage et renvoie le chemin du fichier à venir.
+        """
+        self._in_flight -= 1
+        ended = time.monotonic()
+        duration_ms = (ended - started) * 1000
+        if duration_ms >= PROFILE_SLOW_MS:
+            reason = "slow"
+        elif random.random() < PROFILE_SAMPLE_RATE:
+            reason = "sampled"
         else:
-            competitor_id = fetch_team_id_by_name(team_part)
+            return None
+        intent = re.sub(r"[^\w-]", "_", current_intent.get())
+        path = os.path.join(PROFILE_DIR, f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}_{intent}_{msg_id}.folded")
+        self._pending.put((started, ended, duration_ms, reason, msg_id, intent, path))
+        return path
+
+    def _write(self, started: float, ended: float, duration_ms: float, reason: str, msg_id: str, intent: str, path: str):
+        stacks = Counter(stack for ts, stack in list(self.samples) if started <= ts <= ended)
+        if not stacks:
+            return
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with open(path, "w") as f:
+                f.write(f"# msg_id={msg_id} intent={intent} duration_ms={duration_ms:.0f} reason={reason} interval_ms={PROFILE_INTERVAL_MS}\n")
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            self._rotate()
+        except OSError as e:
+            logger.warning("Écriture du profil %s impossible: %s", path, e)
+
+    def _rotate(self):
+        files = sorted(
+            (os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR) if name.endswith(".folded")),
+            key=os.path.getmtime,
+        )
+        for path in files[:-PROFILE_MAX_FILES]:
+            os.remove(path)
+
+    def _run(self):
+        interval = PROFILE_INTERVAL_MS / 1000
+        # On garde un peu plus que le seuil de lenteur pour couvrir la fenêtre des messages lents
+        horizon = max(PROFILE_SLOW_MS / 1000 * 4, 30.0)
+        while True:
+            time.sleep(interval)
+            while not self._pending.empty():
+                self._write(*self._pending.get())
+            if not self._in_flight:
+                continue
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is None:
+                continue
+            now = time.monotonic()
+            self.samples.append((now, self._fold(frame)))
+            while self.samples and now - self.samples[0][0] > horizon:
+                self.samples.popleft()
+
+    @staticmethod
+    def _fold(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+message_profiler = MessageProfiler() if PROFILE_MESSAGES else None
+
+# ===================== FALLBACK LLM =====================
+LLM_SYSTEM_PROMPT = "You are a helpful assistant specialized in crypto and finance. You can also answer about football teams, their statistics and upcoming matches if the user asks."
+# Deux niveaux : les prompts courts et simples partent sur un modèle rapide avec un budget serré
+LLM_TIERS = {
+    "fast": {"model": os.getenv("LLM_FAST_MODEL", "gpt-4o-mini"), "max_tokens": int(os.getenv("LLM_FAST_MAX_TOKENS", "256"))},
+    "full": {"model": os.getenv("LLM_FULL_MODEL", "gpt-4o"), "max_tokens": int(os.getenv("LLM_FULL_MAX_TOKENS", "1000"))},
+}
+LLM_FAST_MAX_CHARS = int(os.getenv("LLM_FAST_MAX_CHARS", "160"))
+LLM_COMPLEX_HINTS = ("analyse", "analyze", "compare", "explique", "explain", "pourquoi", "why", "stratégie", "strategy", "détaille", "prédiction", "prediction")
+
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+# Métriques par niveau : nombre d'appels, erreurs, tokens, et dernières latences (pour les percentiles)
+llm_metrics = {
+    tier: {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "latencies": deque(maxlen=500)}
+    for tier in LLM_TIERS
+}
+
+def choose_llm_tier(text: str) -> str:
+    lower = text.lower()
+    if len(text) <= LLM_FAST_MAX_CHARS and "\n" not in text and not any(hint in lower for hint in LLM_COMPLEX_HINTS):
+        return "fast"
+    return "full"
+
+async def ask_llm(text: str) -> str:
+    """Appel GPT asynchrone, borné par llm_semaphore et routé vers le niveau adapté au prompt."""
+    tier = choose_llm_tier(text)
+    current_intent.set(f"llm_{tier}")
+    metrics = llm_metrics[tier]
+    async with llm_semaphore:
+        started = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(
+                model=LLM_TIERS[tier]["model"],
+                messages=[
+                    {"role": "system", "content": LLM_SYSTEM_PROMPT},
+                    {"role": "user", "content": text}
+                ],
+                max_tokens=LLM_TIERS[tier]["max_tokens"],
+                temperature=0.7,
+            )
+        except Exception as e:
+            metrics["errors"] += 1
+            return f"Erreur lors de l'appel à ChatGPT: {e}"
+        finally:
+            metrics["calls"] += 1
+            metrics["latencies"].append(time.perf_counter() - started)
+    if response.usage:
+        metrics["prompt_tokens"] += response.usage.prompt_tokens
+        metrics["completion_tokens"] += response.usage.completion_tokens
+    content = response.choices[0].message.content if response.choices else None
+    if not content:
+        # Réponse filtrée ou refus : content peut être None
+        metrics["errors"] += 1
+        return "Erreur: ChatGPT n'a renvoyé aucune réponse, reformule ta question."
+    return content.strip()
+
+def llm_metrics_summary() -> dict[str, dict]:
+    summary = {}
+    for tier, metrics in llm_metrics.items():
+        latencies = sorted(metrics["latencies"])
+        summary[tier] = {
+            "model": LLM_TIERS[tier]["model"],
+            "calls": metrics["calls"],
+            "errors": metrics["errors"],
+            "prompt_tokens": metrics["prompt_tokens"],
+            "completion_tokens": metrics["completion_tokens"],
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000) if latencies else None,
+            "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000) if latencies else None,
+        }
+    return summary
+
+# ===================== CACHE DES RÉPONSES =====================
+# Durée de vie d'une réponse en cache (les stats sont recalculées côté API par le cron)
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "900"))
+# Nombre de requêtes les plus fréquentes gardées pré-calculées
+HOT_QUERY_COUNT = int(os.getenv("HOT_QUERY_COUNT", "50"))
+# Âge (secondes) au-delà duquel une réponse de stats du top est revérifiée auprès de l'API
+STATS_REVALIDATE_AFTER = int(os.getenv("STATS_REVALIDATE_AFTER", "300"))
+
+STAT_RECENT_RE = re.compile(r"stat[s]? (?:les plus récentes|actuelle[s]?|du moment|derni[eè]re[s]?) (?:du|de|d'|de l'|de la|des)?\s*([\w\d\s'-]+)")
+STAT_SEASON_RE = re.compile(r"stat[s]?\s*(?:du|de|d'|de l'|de la|de les|des)?\s*([\w\d\s'-]+?)\s*(?:équipe)?\s*saison\s*(\d+)")
+STAT_YEAR_RE = re.compile(r"stat[s]?\s*(?:du|de|d'|de l'|de la|de les|des)?\s*([\w\d\s'-]+?)\s*(?:équipe)?\s*(?:en|pour|année|an)\s*(\d{4})")
+STAT_TEAM_SEASON_RE = re.compile(r"équipe\s*([\w\d\s]+).*saison\s*(\d+)")
+WEEK_MATCHES_RE = re.compile(r"matchs? (?:du|de|d'|de l'|de la|des)?\s*([\w\d\s'-]+?)\s*cette semaine")
+NEXT_MATCHES_RE = re.compile(r"(\d+)?\s*prochains matchs (?:du|de|d'|de l'|de la|des)?\s*([\w\d\s'-]+)")
+SEASON_RE = re.compile(r"saison\s*(\d+)")
+NEXT_MATCH_RE = re.compile(r"prochain match (?:du|de|d'|de l'|de la|des)?\s*([\w\d\s'-]+)")
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split()).strip(" ?!.")
+
+def team_label(competitor_id: str, fallback: str) -> str:
+    """Nom officiel de l'équipe, pour que "PSG" et "paris saint-germain" produisent la même réponse."""
+    competitor = reference_data.competitor(competitor_id)
+    return (competitor.get("name") or fallback) if competitor else fallback
+
+def parse_intent(lower: str) -> tuple[tuple, tuple] | None:
+    """
+    Routage des questions football : renvoie (clé, dépendances), ou None pour le fallback GPT.
+    La clé ne contient que l'intent, l'id résolu (competitor, joueur, saison) et la période ;
+    render_intent produit la réponse à partir de la clé seule, sans refaire la résolution.
+    Les dépendances servent à invalider la réponse quand les stats ou les matchs changent.
+    """
+    def team(part: str) -> str | None:
+        part = part.strip(" -'")
+        return part if part.isdigit() else resolve_team_id(part)
+
+    # Joueurs avant les équipes : "stats de Mbappé saison 3" ne doit pas partir en recherche d'équipe
+    player = match_player_query(lower)
+    if player is not None:
+        name_part, season_id, players = player
+        if not players:
+            return ("player_season_unknown", fold_name(name_part), season_id), ()
+        if len(players) != 1:
+            return ("players_ambiguous", fold_name(name_part), season_id), ()
+        special_id = players[0]["special_id"]
+        return (("stats_player", special_id, player_index.season_of.get(special_id)),
+                (("player", special_id), ("team", str(players[0].get("competitorId")))))
+    # Une équipe introuvable laisse sa chance au motif suivant ("stats équipe PSG saison 3")
+    not_found = None
+    for intent, pattern in (("stats_recent", STAT_RECENT_RE), ("stats_season", STAT_SEASON_RE),
+                            ("stats_year", STAT_YEAR_RE), ("stats_season", STAT_TEAM_SEASON_RE)):
+        m = pattern.search(lower)
+        if m:
+            competitor_id = team(m.group(1))
             if not competitor_id:
-                return f"Impossible de trouver l'équipe '{team_part}'. Vérifie le nom."
-        data = fetch_team_statistics(competitor_id, season_id)
-        if "error" in data:
-            return f"Erreur lors de la récupération des stats: {data['error']}"
-        stats = data.get("competitor", {}).get("statistics", [])
-        if not stats:
-            return "Aucune statistique trouvée pour cette équipe/saison."
-        lines = [f"Statistiques principales pour l'équipe {team_part} (saison {season_id}):"]
-        for stat in stats:
-            lines.append(f"- {stat.get('type', 'Type inconnu')}: {stat.get('value', 'N/A')}")
-        return "\n".join(lines)
-    # Prochain match d'une équipe (ex: "prochain match du PSG", "prochain match marseille", etc.)
-    m3 = re.search(r"prochain match (?:du|de|d'|de l'|de la|des)?\s*([\w\d\s'-]+)", lower)
-    if m3:
-        team_part = m3.group(1).strip(" -'")
-        competitor_id = fetch_team_id_by_name(team_part)
+                not_found = not_found or (("team_not_found", m.group(1).strip(" -'"), None), ())
+                continue
+            period = m.group(2) if pattern.groups > 1 else "latest"
+            return (intent, competitor_id, period), (("team", competitor_id), ("stats", competitor_id))
+    if not_found:
+        return not_found
+    season = SEASON_RE.search(lower)
+    m_week, m_next = WEEK_MATCHES_RE.search(lower), NEXT_MATCHES_RE.search(lower)
+    if (m_week or m_next) and not season:
+        # Équipe inconnue ("prochains matchs à venir") : on laisse passer vers les intents suivants
+        competitor_id = team(m_week.group(1) if m_week else m_next.group(2))
+        if competitor_id:
+            # Réponse relative à la semaine en cours : la date fait partie de la clé
+            period = datetime.now(timezone.utc).date().isoformat() if m_week else int(m_next.group(1) or 5)
+            return ("week_matches" if m_week else "next_matches", competitor_id, period), (("team", competitor_id), ("matches",))
+    m = NEXT_MATCH_RE.search(lower)
+    if m and not season:
+        competitor_id = team(m.group(1))
         if not competitor_id:
-            return f"Impossible de trouver l'équipe '{team_part}'. Vérifie le nom."
-        season_id = fetch_season_id_by_team_id(competitor_id)
-        if not season_id:
-            return f"Impossible de trouver la saison pour l'équipe '{team_part}'."
-        data = fetch_upcoming_matches(season_id)
+            return ("team_not_found", m.group(1).strip(" -'"), None), ()
+        return ("next_match", competitor_id, 1), (("team", competitor_id), ("matches",))
+    if ("prochain" in lower or "à venir" in lower or "upcoming" in lower) and "match" in lower and "saison" in lower:
+        if season:
+            return ("season_matches", season.group(1), 5), (("matches",),)
+        return ("season_missing", None, None), ()
+    return None
+
+def render_intent(key: tuple) -> str:
+    """Réponse d'un intent déjà résolu par parse_intent (aucune nouvelle résolution de nom)."""
+    intent, subject, period = key
+    if intent == "team_not_found":
+        return f"Impossible de trouver l'équipe '{subject}'. Vérifie le nom."
+    if intent == "season_missing":
+        return "Merci de préciser la saison (ex: 'prochains matchs saison 5')."
+    if intent == "season_matches":
+        data = refresh_upcoming_index(subject)
         if "error" in data:
             return f"Erreur lors de la récupération des matchs: {data['error']}"
         matches = data.get("upcomingMatches", [])
-        team_name_official = None
-        try:
-            url = f"https://chillguys.vercel.app/competitors?id={competitor_id}"
-            resp = requests.get(url, timeout=10)
-            if resp.status_code == 200:
-                data_team = resp.json()
-                competitors = data_team.get("data", [])
-                if competitors:
-                    team_name_official = competitors[0].get("name")
-        except Exception:
-            pass
-        if not team_name_official:
-            team_name_official = team_part
-        filtered = [m for m in matches if str(m.get('home_team')) == team_name_official or str(m.get('away_team')) == team_name_official]
-        if not filtered:
-            for m in matches:
-                if (m.get('home_competitor', {}).get('id') == int(competitor_id)) or (m.get('away_competitor', {}).get('id') == int(competitor_id)):
-                    filtered.append(m)
-        if not filtered:
-            return f"Aucun match à venir trouvé pour {team_name_official}."
-        match = filtered[0]
-        return f"Prochain match de {team_name_official}: {match['home_team']} vs {match['away_team']} le {match['start_time']}"
-    elif ("prochain" in lower or "à venir" in lower or "upcoming" in lower) and "match" in lower and "saison" in lower:
-        m = re.search(r"saison\s*(\d+)", lower)
-        if m:
-            season_id = m.group(1)
-            data = fetch_upcoming_matches(season_id)
-            if "error" in data:
-                return f"Erreur lors de la récupération des matchs: {data['error']}"
-            matches = data.get("upcomingMatches", [])
-            if not matches:
-                return "Aucun match à venir trouvé pour cette saison."
-            lines = [f"Matchs à venir pour la saison {season_id}:"]
-            for match in matches[:5]:
-                lines.append(f"- {match['home_team']} vs {match['away_team']} le {match['start_time']}")
-            return "\n".join(lines)
-        else:
-            return "Merci de préciser la saison (ex: 'prochains matchs saison 5')."
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant specialized in crypto and finance. You can also answer about football teams, their statistics and upcoming matches if the user asks."},
-                {"role": "user", "content": text}
-            ],
-            max_tokens=1000,
-            temperature=0.7,
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Erreur lors de l'appel à ChatGPT: {e}"
+        if not matches:
+            return "Aucun match à venir trouvé pour cette saison."
+        lines = [f"Matchs à venir pour la saison {subject}:"]
+        for match in matches[:period]:
+            lines.append(f"- {format_match(match)}")
+        return "\n".join(lines)
+    if intent == "player_season_unknown":
+        players = player_index.search(subject)
+        name = player_display_name(players[0]) if len(players) == 1 else subject
+        return f"Aucune donnée pour {name} en saison {period} (saison inconnue ou pas encore chargée)."
+    if intent == "players_ambiguous":
+        return answer_players(subject, player_index.search(subject, period))
+    if intent == "stats_player":
+        player = player_index.players.get(subject)
+        return answer_players(subject, [player] if player else [])
+    label = fetch_team_official_name(subject) or subject
+    if intent == "stats_recent":
+        season = resolve_season(subject)
+        if not season:
+            return f"Impossible de trouver la saison la plus récente pour l'équipe '{label}'."
+        year = season.get("year")
+        return answer_team_stats(subject, str(season["special_id"]),
+                                 f"Statistiques les plus récentes pour l'équipe {label} (saison {year})",
+                                 f"Aucune statistique trouvée pour {label} (saison {year}).")
+    if intent == "stats_season":
+        return answer_team_stats(subject, period, f"Statistiques principales pour l'équipe {label} (saison {period})",
+                                 f"Aucune statistique trouvée pour {label} (saison {period}).")
+    if intent == "stats_year":
+        season_id = resolve_season_id_by_year(subject, period)
+        if not season_id:
+            return f"Impossible de trouver la saison {period} pour l'équipe '{label}'."
+        return answer_team_stats(subject, season_id, f"Statistiques principales pour l'équipe {label} en {period}",
+                                 f"Aucune statistique trouvée pour {label} en {period}.")
+    # next_match, next_matches, week_matches
+    season_id = resolve_season_id(subject)
+    if not season_id:
+        return f"Impossible de trouver la saison pour l'équipe '{label}'."
+    n = period if isinstance(period, int) else 1
+    return answer_team_upcoming(label, subject, season_id, n=n, this_week=intent == "week_matches")
+
+class AnswerCache:
+    """
+    Réponses finales indexées par intent normalisé. L'invalidation passe par des
+    compteurs de génération : invalider ("team", id), ("stats", id) ou ("matches",)
+    est en O(1) et rend périmées toutes les réponses qui en dépendent.
+    """
+
+    def __init__(self):
+        self._answers: dict[tuple, tuple[float, float, dict[tuple, int], str]] = {}
+        self._generations: dict[tuple, int] = {}
+        self._query_hits: Counter = Counter()
+        # texte normalisé -> (clé, dépendances) de l'intent correspondant
+        self._query_intents: dict[str, tuple[tuple, tuple]] = {}
+        self.hot_queries: dict[str, tuple[tuple, tuple]] = {}
+        # (competitor, saison) -> empreinte des dernières stats renvoyées par l'API
+        self._stat_fingerprints: dict[tuple[str, str], int] = {}
+
+    def invalidate(self, *dependency):
+        self._generations[dependency] = self._generations.get(dependency, 0) + 1
+
+    def get(self, key: tuple) -> str | None:
+        entry = self._answers.get(key)
+        if entry is None:
+            return None
+        _, expires_at, deps, answer = entry
+        if time.monotonic() > expires_at or any(self._generations.get(dep, 0) != gen for dep, gen in deps.items()):
+            self._answers.pop(key, None)
+            return None
+        return answer
+
+    def store(self, key: tuple, dependencies: tuple, answer: str):
+        """Met en cache une réponse réussie (les messages d'erreur ne sont jamais gardés)."""
+        if answer.startswith(("Erreur", "Impossible")):
+            return
+        ttl = ANSWER_CACHE_TTL if key[0].startswith("stats") else min(ANSWER_CACHE_TTL, UPCOMING_INDEX_TTL)
+        deps = {dep: self._generations.get(dep, 0) for dep in dependencies}
+        now = time.monotonic()
+        self._answers[key] = (now, now + ttl, deps, answer)
+
+    def note_statistics(self, competitor_id: str, season_id: str, stats: list[dict]):
+        """Invalide ("stats", id) quand l'API renvoie des stats différentes de celles du dernier rendu."""
+        fingerprint = hash(json.dumps(stats, sort_keys=True, default=str))
+        previous = self._stat_fingerprints.get((str(competitor_id), str(season_id)))
+        self._stat_fingerprints[(str(competitor_id), str(season_id))] = fingerprint
+        if previous is not None and previous != fingerprint:
+            self.invalidate("stats", str(competitor_id))
+
+    def hot_intent(self, normalized: str) -> tuple[tuple, tuple] | None:
+        """Intent d'une requête du top ; la date des intents relatifs à la semaine est recalculée."""
+        intent = self.hot_queries.get(normalized)
+        if intent is not None and intent[0][0] == "week_matches":
+            (name, competitor_id, _), deps = intent
+            intent = (name, competitor_id, datetime.now(timezone.utc).date().isoformat()), deps
+        return intent
+
+    def record(self, normalized: str, intent: tuple[tuple, tuple]):
+        self._query_hits[normalized] += 1
+        self._query_intents[normalized] = intent
+
+    def refresh_hot_queries(self) -> list[str]:
+        """
+        Recalcule le top des requêtes ; renvoie celles dont la réponse doit être (re)pré-calculée :
+        absente du cache, ou réponse de stats plus vieille que STATS_REVALIDATE_AFTER (le re-rendu
+        compare les stats à la version précédente et invalide ("stats", id) si elles ont changé).
+        """
+        top = self._query_hits.most_common(HOT_QUERY_COUNT)
+        self.hot_queries = {text: self._query_intents[text] for text, _ in top}
+        # Borne la mémoire : on ne garde que les compteurs proches du top
+        if len(self._query_hits) > HOT_QUERY_COUNT * 20:
+            self._query_hits = Counter(dict(self._query_hits.most_common(HOT_QUERY_COUNT * 10)))
+            self._query_intents = {text: self._query_intents[text] for text in self._query_hits}
+        due = {}
+        now = time.monotonic()
+        for text in self.hot_queries:
+            key, _ = self.hot_intent(text)
+            if key in due:
+                continue
+            if self.get(key) is None:
+                due[key] = text
+            elif key[0].startswith("stats") and now - self._answers[key][0] > STATS_REVALIDATE_AFTER:
+                due[key] = text
+        return list(due.values())
+
+answer_cache = AnswerCache()
+
+def _invalidate_reference_row(collection: str, row_id: int):
+    if collection == "competitors":
+        answer_cache.invalidate("team", str(row_id))
+
+reference_data.listeners.append(_invalidate_reference_row)
+
+async def answer_message(text: str, sender: str | None = None) -> str:
+    """
+    Point d'entrée du chat : abonnements aux rappels (propres à l'expéditeur, jamais en cache),
+    top des requêtes, cache par intent, rendu de l'intent résolu, puis GPT.
+    """
+    if sender is not None:
+        subscription_answer = answer_subscription(sender, text.lower())
+        if subscription_answer is not None:
+            current_intent.set("subscription")
+            return subscription_answer
+    normalized = normalize_query(text)
+    intent = answer_cache.hot_intent(normalized) or parse_intent(text.lower())
+    current_intent.set(intent[0][0] if intent else "direct")
+    if intent is None:
+        return await ask_llm(text)
+    answer_cache.record(normalized, intent)
+    answer = answer_cache.get(intent[0])
+    if answer is None:
+        answer = render_intent(intent[0])
+        answer_cache.store(*intent, answer)
+    return answer
+
+def prerender_query(normalized: str):
+    """Recalcule la réponse d'une requête du top sans compter de hit."""
+    intent = answer_cache.hot_intent(normalized)
+    if intent is None:
+        return
+    answer_cache.store(*intent, render_intent(intent[0]))
+
+# ===================== RAPPELS DE MATCHS =====================
+# Délai entre le rappel et le coup d'envoi, et nombre d'envois ctx.send lancés en parallèle
+REMINDER_LEAD = int(os.getenv("REMINDER_LEAD_MINUTES", "60")) * 60
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+
+SUBSCRIBE_RE = re.compile(r"(?:pr[ée]viens|rappelle|abonne)[- ]moi (?:avant |pour |aux |à )?(?:les |des )?(?:prochains )?matchs? (?:du|de|d'|de l'|de la|des)?\s*([\w\d\s'-]+)")
+UNSUBSCRIBE_RE = re.compile(r"(?:d[ée]sabonne[- ]moi (?:des |aux )?(?:matchs? )?|(?:arr[êe]te|stop) (?:les )?rappels (?:des matchs )?)(?:du|de|d'|de l'|de la|des)?\s*([\w\d\s'-]+)")
+
+def match_competitor_ids(match: dict) -> set[str]:
+    """Ids des deux équipes d'un match ; l'API ne renvoyant que les noms, on passe par la copie locale."""
+    ids = set()
+    for side in ("home", "away"):
+        competitor = match.get(f"{side}_competitor") or {}
+        if competitor.get("id") is not None:
+            ids.add(str(competitor["id"]))
+        elif match.get(f"{side}_team"):
+            competitor_id = reference_data.by_name.get(str(match[f"{side}_team"]).lower())
+            if competitor_id is not None:
+                ids.add(str(competitor_id))
+    return ids
+
+class MatchReminderScheduler:
+    """
+    Abonnements expéditeur -> équipe et rappels avant les matchs.
+    Le tas ne contient qu'une entrée par match (et non par abonnement) : s'abonner est en O(1),
+    planifier un match en O(log n), et chaque échéance réveille une seule fois la boucle qui
+    envoie le rappel à tous les abonnés des deux équipes, par lots.
+    Chaque rafraîchissement d'une saison est réconcilié avec les matchs suivis : un match
+    disparu (annulé) est oublié, un match déjà rappelé ne l'est plus tant que son horaire
+    ne change pas.
+    """
+
+    def __init__(self):
+        self.subscribers: dict[str, set[str]] = {}  # competitor_id -> expéditeurs
+        self.subscriptions: dict[str, set[str]] = {}  # expéditeur -> competitor_ids
+        self.seasons: set[str] = set()  # saisons des équipes suivies, à rafraîchir périodiquement
+        self._heap: list[tuple[float, str]] = []  # (instant du rappel, clé du match)
+        # clé du match -> (instant du rappel, match) ; une entrée du tas qui ne correspond plus est ignorée
+        self._scheduled: dict[str, tuple[float, dict]] = {}
+        # clé du match -> start_time pour lequel le rappel est déjà parti
+        self._reminded: dict[str, str] = {}
+        # saison -> clés des matchs planifiés ou rappelés, pour la réconciliation
+        self._season_keys: dict[str, set[str]] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        # équipes dont la liste d'abonnés a changé depuis la dernière sauvegarde
+        self._dirty_teams: set[str] = set()
+        # Dernier état sauvegardé (équipe -> abonnés), mis à jour par take_changes
+        self._persisted: dict[str, list[str]] = {}
+
+    def subscribe(self, sender: str, competitor_id: str) -> bool:
+        senders = self.subscribers.setdefault(competitor_id, set())
+        if sender in senders:
+            return False
+        senders.add(sender)
+        self.subscriptions.setdefault(sender, set()).add(competitor_id)
+        self._dirty_teams.add(competitor_id)
+        return True
+
+    def unsubscribe(self, sender: str, competitor_id: str) -> bool:
+        senders = self.subscribers.get(competitor_id)
+        if not senders or sender not in senders:
+            return False
+        senders.discard(sender)
+        if not senders:
+            del self.subscribers[competitor_id]
+        self.subscriptions[sender].discard(competitor_id)
+        if not self.subscriptions[sender]:
+            del self.subscriptions[sender]
+        self._dirty_teams.add(competitor_id)
+        return True
+
+    def schedule_matches(self, season_id: str, matches: list[dict]):
+        """
+        Réconcilie les matchs suivis d'une saison avec sa liste à jour : oublie les matchs
+        disparus, planifie les nouveaux et replanifie ceux dont l'horaire a changé.
+        """
+        if self._loop is not None and threading.get_ident() != self._loop_thread:
+            # Appel depuis un thread (asyncio.to_thread) : le tas n'est modifié que sur la boucle
+            self._loop.call_soon_threadsafe(self.schedule_matches, season_id, matches)
+            return
+        season_id = str(season_id)
+        keys = {self._match_key(match) for match in matches}
+        tracked = self._season_keys.get(season_id, set())
+        for key in tracked - keys:
+            # Annulé, ou commencé (l'API ne renvoie que les matchs à venir) : l'entrée du tas sera ignorée
+            self._scheduled.pop(key, None)
+            self._reminded.pop(key, None)
+        tracked &= keys
+        self._season_keys[season_id] = tracked
+        if not self.subscribers:
+            return
+        now = time.time()
+        earliest = self._heap[0][0] if self._heap else None
+        for match in matches:
+            start = _parse_start_time(match.get("start_time"))
+            if start is None or start.timestamp() <= now:
+                continue
+            if not match_competitor_ids(match) & self.subscribers.keys():
+                continue
+            key = self._match_key(match)
+            if self._reminded.get(key) == match.get("start_time"):
+                continue
+            scheduled = self._scheduled.get(key)
+            if scheduled and scheduled[1].get("start_time") == match.get("start_time"):
+                continue
+            remind_at = max(start.timestamp() - REMINDER_LEAD, now)
+            self._scheduled[key] = (remind_at, match)
+            self._reminded.pop(key, None)
+            tracked.add(key)
+            heapq.heappush(self._heap, (remind_at, key))
+        if self._wakeup is not None and self._heap and (earliest is None or self._heap[0][0] < earliest):
+            self._wakeup.set()
+
+    @staticmethod
+    def _match_key(match: dict) -> str:
+        return str(match.get("special_id") or match.get("id"))
+
+    def pop_due(self, now: float) -> list[dict]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            remind_at, key = heapq.heappop(self._heap)
+            scheduled = self._scheduled.get(key)
+            if scheduled is None or scheduled[0] != remind_at:
+                continue
+            del self._scheduled[key]
+            self._reminded[key] = scheduled[1].get("start_time")
+            due.append(scheduled[1])
+        return due
+
+    def recipients(self, match: dict) -> set[str]:
+        senders = set()
+        for competitor_id in match_competitor_ids(match):
+            senders |= self.subscribers.get(competitor_id, set())
+        return senders
+
+    def bind_loop(self):
+        """À appeler depuis la boucle d'événements avant toute planification depuis un thread."""
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+
+    async def run(self, ctx: Context):
+        """Boucle unique : dort jusqu'au prochain rappel (ou jusqu'à une planification plus proche)."""
+        if self._loop is None:
+            self.bind_loop()
+        while True:
+            self._wakeup.clear()
+            delay = self._heap[0][0] - time.time() if self._heap else None
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            outgoing = []
+            for match in self.pop_due(time.time()):
+                text = f"🔔 Rappel : {format_match(match)}"
+                outgoing.extend((sender, text) for sender in self.recipients(match))
+            for i in range(0, len(outgoing), REMINDER_BATCH_SIZE):
+                results = await asyncio.gather(
+                    *(send_chat_reply(ctx, sender, str(uuid4()), text) for sender, text in outgoing[i:i + REMINDER_BATCH_SIZE]),
+                    return_exceptions=True,
+                )
+                failures = sum(isinstance(result, Exception) for result in results)
+                if failures:
+                    ctx.logger.warning("⚠️ %d rappels non envoyés", failures, extra={"event": "reminder_error"})
+            if outgoing:
+                ctx.logger.info("🔔 %d rappels envoyés", len(outgoing), extra={"event": "reminders_sent"})
+
+    def take_changes(self) -> dict[str, list[str]] | None:
+        """
+        Contenu à persister si des abonnements ont changé depuis l'appel précédent, sinon None.
+        Seules les équipes modifiées sont recopiées ; le dict renvoyé est une copie dont les listes
+        ne sont plus jamais modifiées, donc sérialisable hors de la boucle.
+        """
+        if not self._dirty_teams:
+            return None
+        for competitor_id in self._dirty_teams:
+            senders = self.subscribers.get(competitor_id)
+            if senders:
+                self._persisted[competitor_id] = list(senders)
+            else:
+                self._persisted.pop(competitor_id, None)
+        self._dirty_teams = set()
+        return dict(self._persisted)
+
+    def load_storage(self, data: dict[str, list[str]]):
+        for competitor_id, senders in (data or {}).items():
+            for sender in senders:
+                self.subscribe(sender, competitor_id)
+        self._persisted = {competitor_id: list(senders) for competitor_id, senders in self.subscribers.items()}
+        self._dirty_teams = set()
+
+match_reminders = MatchReminderScheduler()
+
+# Une seule clé de storage : KeyValueStore.set réécrit tout le fichier JSON à chaque appel,
+# une sauvegarde fait donc un seul set (et aucun tant que rien n'a changé)
+SUBSCRIPTIONS_KEY = "match_subscriptions"
+
+def load_subscriptions(storage) -> dict[str, list[str]]:
+    return storage.get(SUBSCRIPTIONS_KEY) or {}
+
+def save_subscriptions(storage, data: dict[str, list[str]]):
+    """Appelée via asyncio.to_thread : tri et écriture hors de la boucle d'événements."""
+    storage.set(SUBSCRIPTIONS_KEY, {competitor_id: sorted(senders) for competitor_id, senders in sorted(data.items())})
+
+def seed_reminder_seasons():
+    """Après un redémarrage : retrouve les saisons des équipes suivies et replanifie leurs matchs."""
+    for competitor_id in list(match_reminders.subscribers):
+        season_id = resolve_season_id(competitor_id)
+        if season_id:
+            match_reminders.seasons.add(season_id)
+    for season_id in list(match_reminders.seasons):
+        refresh_upcoming_index(season_id, force=True)
+
+def answer_subscription(sender: str, lower: str) -> str | None:
+    """Intents "préviens-moi avant les matchs du PSG" et "désabonne-moi des matchs du PSG"."""
+    m_unsub = UNSUBSCRIBE_RE.search(lower)
+    m_sub = None if m_unsub else SUBSCRIBE_RE.search(lower)
+    if not m_unsub and not m_sub:
+        return None
+    team_part = (m_unsub or m_sub).group(1).strip(" -'")
+    competitor_id = team_part if team_part.isdigit() else resolve_team_id(team_part)
+    if not competitor_id:
+        return f"Impossible de trouver l'équipe '{team_part}'. Vérifie le nom."
+    team_name = team_label(competitor_id, team_part)
+    if m_unsub:
+        if not match_reminders.unsubscribe(sender, competitor_id):
+            return f"Tu n'étais pas abonné aux rappels de {team_name}."
+        return f"🔕 Tu ne recevras plus de rappels pour les matchs de {team_name}."
+    match_reminders.subscribe(sender, competitor_id)
+    season_id = resolve_season_id(competitor_id)
+    if season_id:
+        match_reminders.seasons.add(season_id)
+        refresh_upcoming_index(season_id)
+        match_reminders.schedule_matches(season_id, upcoming_index.season_matches(season_id))
+    lines = [f"🔔 C'est noté : je te préviendrai {REMINDER_LEAD // 60} min avant chaque match de {team_name}."]
+    upcoming = upcoming_index.next_matches(competitor_id, team_name)
+    if upcoming:
+        lines.append(f"Prochain match : {format_match(upcoming[0])}")
+    return "\n".join(lines)
+
+# ===================== LOGIQUE CHATBOT =====================
+def generate_direct_response(text: str) -> str | None:
+    # Routage par parse_intent puis rendu de l'intent résolu ; None -> fallback GPT asynchrone (voir ask_llm)
+    intent = parse_intent(text.lower())
+    return render_intent(intent[0]) if intent else None
 
 # ===================== AGENT & HANDLERS =====================
 # Modèles de base pour la communication
@@ -378,13 +1579,68 @@ class StructuredOutputResponse(Model):
 AI_AGENT_ADDRESS = None  # Désactivé temporairement pour diagnostiquer
 pending_chats = {}
 
+# Messages traités en parallèle : un appel GPT lent ne bloque plus la file, et LLM_MAX_CONCURRENCY
+# borne réellement le nombre d'appels simultanés (les doublons sont gérés par seen_messages)
 chat_agent = Agent(
     name="intellect_chat",
     port=8010,
     seed="bigboy-chat-agent-matth-phrase",
     mailbox=True,
+    handle_messages_concurrently=True,
 )
 
+# Bascule le logger de l'agent sur le pipeline asynchrone avant les autres handlers de démarrage
+@chat_agent.on_event("startup")
+async def setup_log_pipeline(ctx: Context):
+    install_log_pipeline(ctx.logger)
+
+# Synchro périodique des competitors/seasons (requêtes conditionnelles, hors boucle d'événements) ;
+# le tick court laisse refresh() retenter une collection en échec selon son backoff
+@chat_agent.on_interval(period=float(REFERENCE_RETRY_MIN))
+async def sync_reference_data(ctx: Context):
+    applied = await asyncio.to_thread(reference_data.refresh)
+    if any(applied.values()):
+        ctx.logger.info("🔄 Données de référence synchronisées: %s", applied, extra={"event": "reference_synced"})
+
+# Index des joueurs rechargé saison par saison (requêtes conditionnelles, hors boucle d'événements)
+@chat_agent.on_interval(period=float(PLAYER_INDEX_TTL))
+async def sync_player_index(ctx: Context):
+    applied = await asyncio.to_thread(player_index.refresh)
+    if any(applied.values()):
+        ctx.logger.info("👤 Index des joueurs synchronisé: %s", applied, extra={"event": "players_synced"})
+
+# Rappels de matchs : abonnements persistés dans le storage de l'agent, boucle du tas lancée au démarrage
+@chat_agent.on_event("startup")
+async def start_match_reminders(ctx: Context):
+    match_reminders.bind_loop()
+    match_reminders.load_storage(await asyncio.to_thread(load_subscriptions, ctx.storage))
+    asyncio.create_task(match_reminders.run(ctx))
+    await asyncio.to_thread(seed_reminder_seasons)
+
+@chat_agent.on_interval(period=60.0)
+async def save_match_subscriptions(ctx: Context):
+    data = match_reminders.take_changes()
+    if data is not None:
+        await asyncio.to_thread(save_subscriptions, ctx.storage, data)
+
+@chat_agent.on_interval(period=float(UPCOMING_INDEX_TTL))
+async def refresh_reminder_seasons(ctx: Context):
+    for season_id in list(match_reminders.seasons):
+        await asyncio.to_thread(refresh_upcoming_index, season_id)
+
+# Pré-calcul des réponses du top des requêtes (réponse ensuite servie par simple lookup)
+@chat_agent.on_interval(period=60.0)
+async def prerender_hot_queries(ctx: Context):
+    for text in answer_cache.refresh_hot_queries():
+        await asyncio.to_thread(prerender_query, text)
+
+# Latences et tokens du fallback GPT, par niveau de modèle
+@chat_agent.on_interval(period=300.0)
+async def log_llm_metrics(ctx: Context):
+    summary = llm_metrics_summary()
+    if any(tier["calls"] for tier in summary.values()):
+        ctx.logger.info("📊 Métriques LLM: %s", summary, extra={"event": "llm_metrics"})
+
 try:
     from uagents_core.contrib.protocols.chat import (
         ChatMessage,
@@ -403,11 +1659,59 @@ if CHAT_PROTOCOL_AVAILABLE:
 else:
     chat_protocol = Protocol("ASI_ONE_Chat")
 
+# ===================== DÉDUPLICATION DES MESSAGES =====================
+# La mailbox peut redélivrer un même ChatMessage : on garde la réponse des derniers msg_id
+SEEN_MESSAGES_MAX = int(os.getenv("SEEN_MESSAGES_MAX", "10000"))
+# (sender, msg_id) -> Future résolue avec (msg_id de la réponse, texte) ou None si le traitement a échoué
+seen_messages: OrderedDict[tuple[str, str], asyncio.Future] = OrderedDict()
+
+def remember_message(key: tuple[str, str]) -> tuple[asyncio.Future, bool]:
+    """Renvoie (future de la réponse, déjà_vu). Un doublon en cours de traitement attend la même future."""
+    reply = seen_messages.get(key)
+    if reply is not None:
+        seen_messages.move_to_end(key)
+        return reply, True
+    reply = asyncio.get_running_loop().create_future()
+    seen_messages[key] = reply
+    while len(seen_messages) > SEEN_MESSAGES_MAX:
+        seen_messages.popitem(last=False)
+    return reply, False
+
+async def send_chat_reply(ctx: Context, sender: str, reply_msg_id: str, response_text: str):
+    if CHAT_PROTOCOL_AVAILABLE:
+        chat_msg = ChatMessage(
+            msg_id=reply_msg_id,
+            timestamp=datetime.now(timezone.utc),
+            content=[TextContent(type="text", text=response_text)]
+        )
+        await ctx.send(sender, chat_msg)
+    else:
+        await ctx.send(sender, response_text)
+
 @chat_protocol.on_message(model=ChatMessage)
 async def handle_chat_message(ctx: Context, sender: str, msg: ChatMessage):
-    ctx.logger.info(f"💬 Message reçu de {sender}")
-    ctx.logger.info(f"🔍 Type de message: {type(msg)}")
-    ctx.logger.info(f"🔍 Contenu brut: {msg}")
+    msg_id = getattr(msg, "msg_id", None)
+    fields = {"sender": sender, "msg_id": str(msg_id)}
+    ctx.logger.info("💬 Message reçu de %s", sender, extra={"event": "message_received", **fields})
+    # Dump du message brut : DEBUG seulement, et échantillonné (catégorie "payload")
+    ctx.logger.debug("🔍 Message brut (%s): %r", type(msg).__name__, msg, extra={"event": "message_payload", "category": "payload", **fields})
+    if CHAT_PROTOCOL_AVAILABLE and msg_id is not None:
+        # Accusé de réception immédiat : la mailbox n'a plus de raison de redélivrer
+        try:
+            await ctx.send(sender, ChatAcknowledgement(timestamp=datetime.now(timezone.utc), acknowledged_msg_id=msg_id))
+        except Exception as e:
+            ctx.logger.error("❌ Erreur envoi accusé de réception: %s", e, extra={"event": "ack_error", **fields})
+    reply = None
+    if msg_id is not None:
+        reply, duplicate = remember_message((sender, str(msg_id)))
+        if duplicate:
+            stored = await reply
+            if stored is not None:
+                ctx.logger.info("♻️ Message %s déjà traité, réponse rejouée à %s", msg_id, sender, extra={"event": "duplicate_replayed", **fields})
+                await send_chat_reply(ctx, sender, *stored)
+                return
+            reply = None
+    profile_started = message_profiler.begin() if message_profiler else None
     text = ""
     try:
         if hasattr(msg, 'content') and msg.content:
@@ -418,26 +1722,20 @@ async def handle_chat_message(ctx: Context, sender: str, msg: ChatMessage):
                     text = str(msg.content[0])
             else:
                 text = str(msg.content)
-        ctx.logger.info(f"📝 Texte extrait: '{text}'")
+        ctx.logger.debug("📝 Texte extrait: '%s'", text, extra={"event": "text_extracted", **fields})
     except Exception as e:
-        ctx.logger.error(f"❌ Erreur extraction texte: {e}")
+        ctx.logger.error("❌ Erreur extraction texte: %s", e, extra={"event": "extract_error", **fields})
         text = "hello"  # Fallback
     try:
-        response_text = generate_direct_response(text)
-        ctx.logger.info(f"🎯 Réponse générée: '{response_text[:100]}...'")
-        if CHAT_PROTOCOL_AVAILABLE:
-            chat_msg = ChatMessage(
-                msg_id=str(uuid4()),
-                timestamp=datetime.now(timezone.utc),
-                content=[TextContent(type="text", text=response_text)]
-            )
-            await ctx.send(sender, chat_msg)
-            ctx.logger.info(f"📤 Réponse envoyée avec succès à {sender}")
-        else:
-            await ctx.send(sender, response_text)
-            ctx.logger.info(f"📤 Réponse custom envoyée à {sender}")
+        response_text = await answer_message(text, sender)
+        ctx.logger.debug("🎯 Réponse générée: '%.100s...'", response_text, extra={"event": "answer_generated", "intent": current_intent.get(), **fields})
+        reply_msg_id = str(uuid4())
+        if reply is not None:
+            reply.set_result((reply_msg_id, response_text))
+        await send_chat_reply(ctx, sender, reply_msg_id, response_text)
+        ctx.logger.info("📤 Réponse envoyée avec succès à %s", sender, extra={"event": "reply_sent", "intent": current_intent.get(), **fields})
     except Exception as e:
-        ctx.logger.error(f"❌ Erreur envoi réponse: {e}")
+        ctx.logger.error("❌ Erreur envoi réponse: %s", e, extra={"event": "reply_error", **fields})
         try:
             simple_response = "🤖 IntentFi Agent connecté ! Erreur temporaire, mais je suis là."
             if CHAT_PROTOCOL_AVAILABLE:
@@ -449,9 +1747,18 @@ async def handle_chat_message(ctx: Context, sender: str, msg: ChatMessage):
                 await ctx.send(sender, emergency_msg)
             else:
                 await ctx.send(sender, simple_response)
-            ctx.logger.info("🚨 Réponse d'urgence envoyée")
+            ctx.logger.info("🚨 Réponse d'urgence envoyée", extra={"event": "emergency_sent", **fields})
         except Exception as e2:
-            ctx.logger.error(f"💥 Échec complet envoi: {e2}")
+            ctx.logger.error("💥 Échec complet envoi: %s", e2, extra={"event": "send_failed", **fields})
+    finally:
+        # Échec avant d'avoir une réponse : on oublie le msg_id pour que la prochaine redélivrance retente
+        if reply is not None and not reply.done():
+            reply.set_result(None)
+            seen_messages.pop((sender, str(msg_id)), None)
+        if profile_started is not None:
+            profile_path = message_profiler.end(profile_started, str(msg_id))
+            if profile_path:
+                ctx.logger.info("🔥 Profil programmé: %s", profile_path, extra={"event": "profile_written", "intent": current_intent.get(), **fields})
     return
 
 # Handler pour la réponse structurée de Claude (maintenant sur chat_agent)
@@ -505,383 +1812,3 @@ async def startup_event(ctx: Context):
 
 if __name__ == "__main__":
     chat_agent.run()
-
-def fetch_team_statistics(competitor_id: str, season_id: str) -> dict:
-    """Appelle l'API interne pour récupérer les stats d'une équipe pour une saison."""
-    url = f"https://chillguys.vercel.app/competitors/{competitor_id}/seasons/{season_id}/statistics"
-    try:
-        resp = requests.get(url, timeout=10)
-        if resp.status_code == 200:
-            return resp.json()
-        else:
-            return {"error": f"Erreur API: {resp.status_code}"}
-    except Exception as e:
-        return {"error": str(e)}
-
-def fetch_team_id_by_name(team_name: str) -> str | None:
-    """Recherche l'id d'une équipe à partir de son nom, short_name ou abbreviation via l'API interne."""
-    import urllib.parse
-    # Essaye d'abord sur le nom
-    url = f"https://chillguys.vercel.app/competitors?name={urllib.parse.quote(team_name)}"
-    try:
-        resp = requests.get(url, timeout=10)
-        if resp.status_code == 200:
-            data = resp.json()
-            competitors = data.get("data", [])
-            # Recherche stricte (nom exact, insensible à la casse)
-            for c in competitors:
-                if c.get("name", "").lower() == team_name.lower():
-                    return str(c["id"])
-            # Recherche sur short_name
-            url2 = f"https://chillguys.vercel.app/competitors?short_name={urllib.parse.quote(team_name)}"
-            resp2 = requests.get(url2, timeout=10)
-            if resp2.status_code == 200:
-                data2 = resp2.json()
-                competitors2 = data2.get("data", [])
-                for c in competitors2:
-                    if c.get("short_name", "").lower() == team_name.lower():
-                        return str(c["id"])
-            # Recherche sur abbreviation
-            url3 = f"https://chillguys.vercel.app/competitors?abbreviation={urllib.parse.quote(team_name)}"
-            resp3 = requests.get(url3, timeout=10)
-            if resp3.status_code == 200:
-                data3 = resp3.json()
-                competitors3 = data3.get("data", [])
-                for c in competitors3:
-                    if c.get("abbreviation", "").lower() == team_name.lower():
-                        return str(c["id"])
-            # Si rien trouvé, tente une correspondance partielle (nom ou short_name contient le terme)
-            for c in competitors:
-                if team_name.lower() in c.get("name", "").lower() or team_name.lower() in c.get("short_name", "").lower():
-                    return str(c["id"])
-        return None
-    except Exception:
-        return None
-
-def fetch_upcoming_matches(season_id: str) -> dict:
-    """Appelle l'API interne pour récupérer les prochains matchs d'une saison."""
-    url = f"https://chillguys.vercel.app/seasons/{season_id}/upcoming-matches"
-    try:
-        resp = requests.get(url, timeout=10)
-        if resp.status_code == 200:
-            return resp.json()
-        else:
-            return {"error": f"Erreur API: {resp.status_code}"}
-    except Exception as e:
-        return {"error": str(e)}
-
-def fetch_season_id_by_team_id(team_id: str) -> str | None:
-    """Récupère la saison courante (la plus récente) pour une équipe donnée."""
-    url = f"https://chillguys.vercel.app/competitors?id={team_id}&include_season=true"
-    try:
-        resp = requests.get(url, timeout=10)
-        if resp.status_code == 200:
-            data = resp.json()
-            competitors = data.get("data", [])
-            if competitors and competitors[0].get("season"):
-                return str(competitors[0]["season"]["special_id"])
-        return None
-    except Exception:
-        return None
-
-def generate_direct_response(text: str) -> str:
-    """
-    Génère une réponse directe, en priorisant les requêtes football (stats, prochain match) puis fallback GPT.
-    """
-    import re
-    lower = text.lower()
-    # Stats récentes/actuelles d'une équipe (ex: 'stats les plus récentes du PSG', 'stats actuelles OM')
-    m_recent = re.search(r"stat[s]? (?:les plus récentes|actuelle[s]?|du moment|derni[eè]re[s]?) (?:du|de|d'|de l'|de la|des)?\s*([\w\d\s'-]+)", lower)
-    if m_recent:
-        team_part = m_recent.group(1).strip(" -'")
-        if team_part.isdigit():
-            competitor_id = team_part
-        else:
-            competitor_id = fetch_team_id_by_name(team_part)
-            if not competitor_id:
-                return f"Impossible de trouver l'équipe '{team_part}'. Vérifie le nom."
-        # On essaie de récupérer la saison la plus récente via /competitors?id=...&include_season=true
-        url = f"https://chillguys.vercel.app/competitors?id={competitor_id}&include_season=true"
-        try:
-            resp = requests.get(url, timeout=10)
-            if resp.status_code == 200:
-                data = resp.json()
-                competitors = data.get("data", [])
-                if competitors and competitors[0].get("season"):
-                    season = competitors[0]["season"]
-                    season_id = str(season["special_id"])
-                    year = season.get("year")
-                    data_stats = fetch_team_statistics(competitor_id, season_id)
-                    if "error" in data_stats:
-                        return f"Erreur lors de la récupération des stats: {data_stats['error']}"
-                    stats = data_stats.get("competitor", {}).get("statistics", [])
-                    if not stats:
-                        return f"Aucune statistique trouvée pour {team_part} (saison {year})."
-                    lines = [f"Statistiques les plus récentes pour l'équipe {team_part} (saison {year}):"]
-                    for stat in stats:
-                        lines.append(f"- {stat.get('type', 'Type inconnu')}: {stat.get('value', 'N/A')}")
-                    return "\n".join(lines)
-        except Exception:
-            pass
-        # Fallback: essayer de récupérer la saison la plus récente via /seasons?include_competitors=true
-        try:
-            seasons_resp = requests.get("https://chillguys.vercel.app/seasons?include_competitors=true", timeout=10)
-            if seasons_resp.status_code == 200:
-                seasons = seasons_resp.json().get("data", [])
-                # Trie par année décroissante si possible
-                seasons = sorted(seasons, key=lambda s: s.get("year", 0), reverse=True)
-                for season in seasons:
-                    for comp in season.get("competitors", []):
-                        if str(comp.get("id")) == str(competitor_id):
-                            season_id = str(season["special_id"])
-                            year = season.get("year")
-                            data_stats = fetch_team_statistics(competitor_id, season_id)
-                            if "error" in data_stats:
-                                return f"Erreur lors de la récupération des stats: {data_stats['error']}"
-                            stats = data_stats.get("competitor", {}).get("statistics", [])
-                            if not stats:
-                                continue
-                            lines = [f"Statistiques les plus récentes pour l'équipe {team_part} (saison {year}):"]
-                            for stat in stats:
-                                lines.append(f"- {stat.get('type', 'Type inconnu')}: {stat.get('value', 'N/A')}")
-                            return "\n".join(lines)
-        except Exception as e:
-            pass
-        return f"Aucune statistique trouvée pour l'équipe '{team_part}'."
-
-    # Stats équipe + saison (ex: 'stats du PSG saison 3')
-    m = re.search(r"stat[s]?\s*(?:du|de|d'|de l'|de la|de les|des)?\s*([\w\d\s'-]+?)\s*(?:équipe)?\s*saison\s*(\d+)", lower)
-    if m:
-        team_part, season_id = m.group(1).strip(), m.group(2)
-        team_part = team_part.strip(" -'")
-        if team_part.isdigit():
-            competitor_id = team_part
-        else:
-            competitor_id = fetch_team_id_by_name(team_part)
-            if not competitor_id:
-                return f"Impossible de trouver l'équipe '{team_part}'. Vérifie le nom."
-        data = fetch_team_statistics(competitor_id, season_id)
-        if "error" in data:
-            return f"Erreur lors de la récupération des stats: {data['error']}"
-        stats = data.get("competitor", {}).get("statistics", [])
-        if not stats:
-            return f"Aucune statistique trouvée pour {team_part} (saison {season_id})."
-        lines = [f"Statistiques principales pour l'équipe {team_part} (saison {season_id}):"]
-        for stat in stats:
-            lines.append(f"- {stat.get('type', 'Type inconnu')}: {stat.get('value', 'N/A')}")
-        return "\n".join(lines)
-
-    # Stats équipe + année (ex: 'stats du PSG en 2025')
-    m_year = re.search(r"stat[s]?\s*(?:du|de|d'|de l'|de la|de les|des)?\s*([\w\d\s'-]+?)\s*(?:équipe)?\s*(?:en|pour|année|an)\s*(\d{4})", lower)
-    if m_year:
-        team_part, year = m_year.group(1).strip(), m_year.group(2)
-        team_part = team_part.strip(" -'")
-        if team_part.isdigit():
-            competitor_id = team_part
-        else:
-            competitor_id = fetch_team_id_by_name(team_part)
-            if not competitor_id:
-                return f"Impossible de trouver l'équipe '{team_part}'. Vérifie le nom."
-        season_id = fetch_season_id_by_team_and_year(competitor_id, year)
-        if not season_id:
-            # Fallback: chercher la saison via /seasons?year=...&include_competitors=true
-            try:
-                url = f"https://chillguys.vercel.app/seasons?year={year}&include_competitors=true"
-                resp = requests.get(url, timeout=10)
-                if resp.status_code == 200:
-                    seasons = resp.json().get("data", [])
-                    for season in seasons:
-                        for comp in season.get("competitors", []):
-                            if str(comp.get("id")) == str(competitor_id):
-                                season_id = str(season["special_id"])
-                                break
-                        if season_id:
-                            break
-            except Exception:
-                pass
-        if not season_id:
-            return f"Impossible de trouver la saison {year} pour l'équipe '{team_part}'."
-        data = fetch_team_statistics(competitor_id, season_id)
-        if "error" in data:
-            return f"Erreur lors de la récupération des stats: {data['error']}"
-        stats = data.get("competitor", {}).get("statistics", [])
-        if not stats:
-            return f"Aucune statistique trouvée pour {team_part} en {year}."
-        lines = [f"Statistiques principales pour l'équipe {team_part} en {year}:"]
-        for stat in stats:
-            lines.append(f"- {stat.get('type', 'Type inconnu')}: {stat.get('value', 'N/A')}")
-        return "\n".join(lines)
-
-    # Ancienne syntaxe : "stats équipe PSG saison 3"
-    m2 = re.search(r"équipe\s*([\w\d\s]+).*saison\s*(\d+)", lower)
-    if m2:
-        team_part, season_id = m2.group(1).strip(), m2.group(2)
-        if team_part.isdigit():
-            competitor_id = team_part
-        else:
-            competitor_id = fetch_team_id_by_name(team_part)
-            if not competitor_id:
-                return f"Impossible de trouver l'équipe '{team_part}'. Vérifie le nom."
-        data = fetch_team_statistics(competitor_id, season_id)
-        if "error" in data:
-            return f"Erreur lors de la récupération des stats: {data['error']}"
-        stats = data.get("competitor", {}).get("statistics", [])
-        if not stats:
-            return f"Aucune statistique trouvée pour {team_part} (saison {season_id})."
-        lines = [f"Statistiques principales pour l'équipe {team_part} (saison {season_id}):"]
-        for stat in stats:
-            lines.append(f"- {stat.get('type', 'Type inconnu')}: {stat.get('value', 'N/A')}")
-        return "\n".join(lines)
-
-    # Prochain match d'une équipe ("prochain match du PSG", etc.)
-    m3 = re.search(r"prochain match (?:du|de|d'|de l'|de la|des)?\s*([\w\d\s'-]+)", lower)
-    if m3:
-        team_part = m3.group(1).strip(" -'")
-        competitor_id = fetch_team_id_by_name(team_part)
-        if not competitor_id:
-            return f"Impossible de trouver l'équipe '{team_part}'. Vérifie le nom."
-        # On tente d'abord de trouver la saison via /competitors?id=...&include_season=true
-        season_id = fetch_season_id_by_team_id(competitor_id)
-        # Fallback: chercher la saison la plus récente via /seasons
-        if not season_id:
-            try:
-                seasons_resp = requests.get("https://chillguys.vercel.app/seasons", timeout=10)
-                if seasons_resp.status_code == 200:
-                    seasons = seasons_resp.json().get("data", [])
-                    # Trie par année décroissante
-                    seasons = sorted(seasons, key=lambda s: s.get("year", 0), reverse=True)
-                    for season in seasons:
-                        for comp in season.get("competitors", []):
-                            if str(comp.get("id")) == str(competitor_id):
-                                season_id = str(season["special_id"])
-                                break
-                        if season_id:
-                            break
-            except Exception:
-                pass
-        if not season_id:
-            return f"Impossible de trouver la saison pour l'équipe '{team_part}'."
-        # Récupère les prochains matchs de la saison la plus récente
-        data = fetch_upcoming_matches(season_id)
-        if "error" in data:
-            return f"Erreur lors de la récupération des matchs: {data['error']}"
-        matches = data.get("upcomingMatches", [])
-        # Recherche le vrai nom de l'équipe (pour l'affichage)
-        team_name_official = None
-        try:
-            url = f"https://chillguys.vercel.app/competitors?id={competitor_id}"
-            resp = requests.get(url, timeout=10)
-            if resp.status_code == 200:
-                data_team = resp.json()
-                competitors = data_team.get("data", [])
-                if competitors:
-                    team_name_official = competitors[0].get("name")
-        except Exception:
-            pass
-        if not team_name_official:
-            team_name_official = team_part
-        # Filtrer les matchs où l'équipe est home ou away (par id ou nom)
-        filtered = []
-        for m in matches:
-            # Par nom officiel
-            if str(m.get('home_team')) == team_name_official or str(m.get('away_team')) == team_name_official:
-                filtered.append(m)
-            # Par id dans home_competitor/away_competitor
-            elif (m.get('home_competitor', {}).get('id') == int(competitor_id)) or (m.get('away_competitor', {}).get('id') == int(competitor_id)):
-                filtered.append(m)
-        if not filtered:
-            return f"Aucun match à venir trouvé pour {team_name_official}."
-        match = filtered[0]
-        return f"Prochain match de {team_name_official}: {match.get('home_team','?')} vs {match.get('away_team','?')} le {match.get('start_time','?')}"
-
-    # Ancienne syntaxe : prochains matchs saison X
-    if ("prochain" in lower or "à venir" in lower or "upcoming" in lower) and "match" in lower and "saison" in lower:
-        m = re.search(r"saison\s*(\d+)", lower)
-        if m:
-            season_id = m.group(1)
-            data = fetch_upcoming_matches(season_id)
-            if "error" in data:
-                return f"Erreur lors de la récupération des matchs: {data['error']}"
-            matches = data.get("upcomingMatches", [])
-            if not matches:
-                return "Aucun match à venir trouvé pour cette saison."
-            lines = [f"Matchs à venir pour la saison {season_id}:"]
-            for match in matches[:5]:
-                lines.append(f"- {match.get('home_team','?')} vs {match.get('away_team','?')} le {match.get('start_time','?')}")
-            return "\n".join(lines)
-        else:
-            return "Merci de préciser la saison (ex: 'prochains matchs saison 5')."
-
-    # Sinon, fallback sur ChatGPT
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant specialized in crypto and finance. You can also answer about football teams, their statistics and upcoming matches if the user asks."},
-                {"role": "user", "content": text}
-            ],
-            max_tokens=256,
-            temperature=0.7,
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Erreur lors de l'appel à ChatGPT: {e}"
-    
-# Handler pour la réponse structurée de Claude (maintenant sur chat_agent)
-@chat_agent.on_message(StructuredOutputResponse)
-async def handle_structured_response(ctx: Context, sender: str, msg: StructuredOutputResponse):
-    ctx.logger.info(f"📥 Réponse Claude AI reçue de ...{sender[-8:]}: {msg.output}")
-    
-    response_text = msg.output.get("response", "Désolé, je n'ai pas compris la réponse de l'IA.")
-    conversation_id = msg.output.get("conversation_id")
-    
-    # Trouver l'utilisateur original
-    original_sender = None
-    if conversation_id and conversation_id in pending_chats:
-        original_sender = pending_chats[conversation_id]
-        del pending_chats[conversation_id]
-    
-    if original_sender:
-        if CHAT_PROTOCOL_AVAILABLE:
-            chat_msg = ChatMessage(
-                msg_id=str(uuid4()),
-                timestamp=datetime.now(timezone.utc),
-                content=[TextContent(type="text", text=response_text)]
-            )
-            await ctx.send(original_sender, chat_msg)
-            ctx.logger.info(f"📤 Réponse envoyée à {original_sender}")
-        else:
-            await ctx.send(original_sender, response_text)
-    else:
-        ctx.logger.warning("⚠️ Impossible de trouver l'utilisateur original pour la réponse")
-
-# Handler pour accusé de réception (obligatoire pour le protocole officiel)
-if CHAT_PROTOCOL_AVAILABLE:
-    @chat_protocol.on_message(model=ChatAcknowledgement)
-    async def handle_chat_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
-        ctx.logger.info(f"✅ Accusé de réception reçu de {sender} pour le message {msg.acknowledged_msg_id}")
-
-# Inclusion du protocole de chat uniquement (sans publish_manifest)
-chat_agent.include(chat_protocol)
-
-@chat_agent.on_event("startup")
-async def startup_event(ctx: Context):
-    ctx.logger.info("🚀 Agent de chat IntentFi démarré!")
-    ctx.logger.info(f"🎯 Adresse de l'agent: {ctx.agent.address}")
-    ctx.logger.info(f"🌐 Port: 8010")  # Port fixe
-    ctx.logger.info(f"🔗 Mailbox activée: True")
-    
-    if AI_AGENT_ADDRESS:
-        ctx.logger.info(f"🧠 Communication avec Claude AI: {AI_AGENT_ADDRESS}")
-    else:
-        ctx.logger.info("🧠 Mode réponse directe activé (pas de Claude AI)")
-        
-    ctx.logger.info("💬 Prêt à recevoir des messages via le protocole de chat!")
-    ctx.logger.info("✅ Testez en envoyant 'Hello' ou 'ETH' via Agentverse/ASI One")
-    ctx.logger.info("=" * 80)
-    ctx.logger.info("🔍 ADRESSE POUR AGENTVERSE:")
-    ctx.logger.info(f"   {ctx.agent.address}")
-    ctx.logger.info("=" * 80)
-
-if __name__ == "__main__":
-    chat_agent.run()
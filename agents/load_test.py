@@ -0,0 +1,218 @@
+
+# ===================== HARNESS DE CHARGE DU CHAT =====================
+# Appelle handle_chat_message directement avec un faux Context uAgents, des milliers
+# d'expéditeurs simulés, le stub local de l'API (api_stub.py) et un faux client GPT.
+# Mesure le débit, l'attente en file, les latences (p50/p99) et le retard de la boucle asyncio.
+# Les messages sont distribués comme le fait l'agent : une tâche par message si chat_agent
+# traite les messages en parallèle, sinon une file consommée un message à la fois (--dispatch).
+#
+# Usage : python load_test.py --rate 200 --duration 30 --senders 5000 \
+#             --mix stats=0.4,next_match=0.3,week=0.1,llm=0.2 --llm-latency 0.8
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+from api_stub import PLAYER_NAMES, TEAMS, ChillApiStub, build_fixture
+
+# Gabarits de messages par intent ; {team} et {player} sont remplacés par un alias d'équipe / un joueur du stub
+INTENT_TEMPLATES = {
+    "stats": ["stats du {team} saison 3", "stats de {team} en 2025", "stats les plus récentes du {team}"],
+    "next_match": ["prochain match du {team}", "prochain match de {team}"],
+    "next_matches": ["3 prochains matchs du {team}", "prochains matchs de {team}"],
+    "week": ["matchs du {team} cette semaine"],
+    "player": ["stats de {player} saison 3", "stats de {player}", "stats du joueur {player}"],
+    "llm": ["c'est quoi un fan token ?", "explique-moi le staking de CHZ", "pourquoi le prix du PSG token monte ?"],
+}
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        intent, _, weight = part.partition("=")
+        if intent not in INTENT_TEMPLATES:
+            raise argparse.ArgumentTypeError(f"Intent inconnu: {intent} (choix: {', '.join(INTENT_TEMPLATES)})")
+        mix[intent] = float(weight or 1)
+    return mix
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+class FakeCompletions:
+    """Remplace client.chat.completions : latence configurable, pas d'appel réseau."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def create(self, model: str, messages: list, max_tokens: int, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(random.expovariate(1 / self.latency) if self.latency else 0)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"[{model}] réponse simulée"))],
+            usage=SimpleNamespace(prompt_tokens=len(messages[-1]["content"]) // 4, completion_tokens=min(max_tokens, 60)),
+        )
+
+class FakeContext:
+    """Sous-ensemble de uagents.Context utilisé par les handlers : logger, agent.address et send()."""
+
+    def __init__(self, chat_message_type, install_log_pipeline):
+        self.logger = logging.getLogger("load_test.agent")
+        # Même pipeline de logs que l'agent (user-033) : le coût de journalisation reste celui de la prod
+        install_log_pipeline(self.logger)
+        self.agent = SimpleNamespace(address="agent1qloadtest")
+        self._chat_message_type = chat_message_type
+        self.replies = 0
+        self.acks = 0
+
+    async def send(self, destination: str, message):
+        if isinstance(message, self._chat_message_type):
+            self.replies += 1
+        else:
+            self.acks += 1
+
+async def measure_loop_lag(samples: list[float], stop: asyncio.Event, interval: float = 0.01):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+async def run_load(args, bigboy) -> dict:
+    ctx = FakeContext(bigboy.ChatMessage, bigboy.install_log_pipeline)
+    senders = [f"agent1qsender{i:06d}" for i in range(args.senders)]
+    aliases = [alias for name, short_name, abbreviation in TEAMS for alias in (name, short_name, abbreviation)]
+    # Nom de famille seul ou "Prénom Nom", accentué ou non
+    players = [alias for name in PLAYER_NAMES
+               for alias in (name.split(",")[0], f"{name.split(', ')[1]} {name.split(',')[0]}", bigboy.fold_name(name.split(",")[0]))]
+    intents, weights = zip(*args.mix.items())
+    queue_delays, latencies, per_intent = [], [], {intent: [] for intent in intents + ("duplicate",)}
+    sent_messages: list = []
+    errors = 0
+
+    async def one_message(arrival: float, intent: str, sender: str, msg):
+        nonlocal errors
+        started = time.perf_counter()
+        queue_delays.append(started - arrival)
+        try:
+            await bigboy.handle_chat_message(ctx, sender, msg)
+        except Exception:
+            errors += 1
+        latency = time.perf_counter() - arrival
+        latencies.append(latency)
+        per_intent[intent].append(latency)
+
+    lag_samples: list[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(lag_samples, stop))
+    tasks = []
+    # Mode "serial" : file unique, comme le dispatcher de uagents sans handle_messages_concurrently
+    serial_queue: asyncio.Queue = asyncio.Queue()
+
+    async def serial_consumer():
+        while True:
+            item = await serial_queue.get()
+            if item is None:
+                return
+            await one_message(*item)
+
+    consumer = asyncio.create_task(serial_consumer()) if args.dispatch == "serial" else None
+    messages = 0
+    t0 = time.perf_counter()
+    next_arrival = t0
+    while next_arrival - t0 < args.duration:
+        await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+        intent = random.choices(intents, weights)[0]
+        sender = random.choice(senders)
+        if sent_messages and random.random() < args.duplicates:
+            # Redélivrance simulée : même expéditeur, même msg_id
+            intent = "duplicate"
+            sender, msg = random.choice(sent_messages[-1000:])
+        else:
+            text = random.choice(INTENT_TEMPLATES[intent]).format(team=random.choice(aliases), player=random.choice(players))
+            msg = bigboy.ChatMessage(msg_id=uuid4(), timestamp=datetime.now(timezone.utc),
+                                     content=[bigboy.TextContent(type="text", text=text)])
+            sent_messages.append((sender, msg))
+        if consumer is not None:
+            serial_queue.put_nowait((next_arrival, intent, sender, msg))
+        else:
+            tasks.append(asyncio.create_task(one_message(next_arrival, intent, sender, msg)))
+        messages += 1
+        next_arrival += random.expovariate(args.rate)
+    if consumer is not None:
+        serial_queue.put_nowait(None)
+        await consumer
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await lag_task
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "offered_rate": args.rate,
+        "dispatch": args.dispatch,
+        "messages": messages,
+        "errors": errors,
+        "throughput_msg_s": round(messages / elapsed, 1),
+        "replies": ctx.replies,
+        "acks": ctx.acks,
+        "llm_calls": bigboy.client.chat.completions.calls,
+        "queue_delay_ms": {"p50": ms(percentile(queue_delays, 0.5)), "p99": ms(percentile(queue_delays, 0.99))},
+        "latency_ms": {"mean": ms(statistics.fmean(latencies)) if latencies else None,
+                       "p50": ms(percentile(latencies, 0.5)), "p99": ms(percentile(latencies, 0.99)),
+                       "max": ms(max(latencies)) if latencies else None},
+        "latency_p99_ms_by_intent": {intent: ms(percentile(values, 0.99)) for intent, values in per_intent.items()},
+        "loop_lag_ms": {"p50": ms(percentile(lag_samples, 0.5)), "p99": ms(percentile(lag_samples, 0.99)),
+                        "max": ms(max(lag_samples)) if lag_samples else None},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Harness de charge pour handle_chat_message (bigBoy.py)")
+    parser.add_argument("--rate", type=float, default=100.0, help="Messages par seconde (arrivées poissonniennes)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Durée de l'injection en secondes")
+    parser.add_argument("--senders", type=int, default=2000, help="Nombre d'expéditeurs simulés")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("stats=0.4,next_match=0.3,week=0.1,llm=0.2"),
+                        help="Répartition des intents, ex: stats=0.5,llm=0.5")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="Part de messages redélivrés (même msg_id)")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="Latence moyenne du faux GPT en secondes")
+    parser.add_argument("--extra-teams", type=int, default=0, help="Équipes supplémentaires dans le stub")
+    parser.add_argument("--dispatch", choices=("concurrent", "serial"), default=None,
+                        help="Distribution des messages ; par défaut celle de chat_agent (handle_messages_concurrently)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="Affiche le rapport en JSON brut")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    logging.basicConfig(level=logging.WARNING)
+
+    stub = ChillApiStub(fixture=build_fixture(args.extra_teams)).start()
+    # bigBoy lit sa configuration à l'import : le stub et une clé factice doivent être en place avant
+    os.environ["CHILL_API_URL"] = stub.url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-load-test")
+    import bigBoy
+    if args.dispatch is None:
+        args.dispatch = "concurrent" if bigBoy.chat_agent._handle_messages_concurrently else "serial"
+    bigBoy.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(args.llm_latency)))
+    try:
+        report = asyncio.run(run_load(args, bigBoy))
+    finally:
+        stub.stop()
+    report["api_requests"] = stub.request_count
+    report["api_not_modified"] = stub.not_modified_count
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:>28}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+
+# ===================== TESTS SYNCHRO DES DONNÉES DE RÉFÉRENCE =====================
+# ReferenceDataSync contre le stub local de l'API (api_stub.py) : 304, lignes modifiées,
+# lignes supprimées (avec nettoyage des index) et invalidation via les listeners.
+#
+# Usage : python -m pytest test_reference_sync.py
+import os
+
+import pytest
+
+from api_stub import ChillApiStub, build_fixture
+
+# bigBoy lit sa configuration à l'import (même principe que load_test.py)
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+import bigBoy
+
+@pytest.fixture
+def stub():
+    stub = ChillApiStub(fixture=build_fixture()).start()
+    yield stub
+    stub.stop()
+
+@pytest.fixture
+def sync(stub):
+    sync = bigBoy.ReferenceDataSync(stub.url)
+    sync.refresh(force=True)
+    return sync
+
+def competitor_row(stub, competitor_id: int) -> dict:
+    return next(c for c in stub.fixture["competitors"] if c["id"] == competitor_id)
+
+def test_initial_load_builds_indexes(sync):
+    assert len(sync.rows["competitors"]) == 8
+    assert sync.team_id("PSG") == "1"
+    assert sync.team_id("olympique de marseille") == "2"
+    assert sync.season_of("1")["special_id"] == "126393"
+
+def test_unchanged_collections_answer_304(stub, sync):
+    applied = sync.refresh(force=True)
+    assert applied == {"competitors": 0, "seasons": 0}
+    assert stub.not_modified_count == 2
+
+def test_changed_row_is_reindexed(stub, sync):
+    competitor_row(stub, 2)["name"] = "Olympique Marseille"
+    stub.touch()
+    assert sync.refresh(force=True)["competitors"] == 1
+    assert sync.team_id("olympique marseille") == "2"
+    assert "olympique de marseille" not in sync.by_name
+    assert sync.competitor("2")["name"] == "Olympique Marseille"
+
+def test_removed_row_is_unindexed(stub, sync):
+    stub.fixture["competitors"] = [c for c in stub.fixture["competitors"] if c["id"] != 3]
+    stub.touch()
+    assert sync.refresh(force=True)["competitors"] == 1
+    assert sync.competitor("3") is None
+    assert "olympique lyonnais" not in sync.by_name
+    assert "lyon" not in sync.by_short_name
+    assert "ol" not in sync.by_abbreviation
+    assert sync.team_id("Lyon") is None
+
+def test_swap_keeps_previous_snapshot_intact(stub, sync):
+    # Un lecteur qui tient l'ancien dict ne doit pas le voir changer pendant une synchro
+    snapshot = sync.rows["competitors"]
+    stub.fixture["competitors"] = [c for c in stub.fixture["competitors"] if c["id"] != 4]
+    stub.touch()
+    sync.refresh(force=True)
+    assert 4 in snapshot
+    assert 4 not in sync.rows["competitors"]
+
+def test_listeners_receive_changed_and_removed_rows(stub, sync):
+    calls = []
+    sync.listeners.append(lambda collection, row_id: calls.append((collection, row_id)))
+    competitor_row(stub, 1)["short_name"] = "Paris SG"
+    stub.fixture["competitors"] = [c for c in stub.fixture["competitors"] if c["id"] != 5]
+    stub.touch()
+    sync.refresh(force=True)
+    assert sorted(calls) == [("competitors", 1), ("competitors", 5)]
+
+def test_listener_invalidates_cached_answers(stub, sync):
+    sync.listeners.append(bigBoy._invalidate_reference_row)
+    key = ("stats_season", "1", "3")
+    bigBoy.answer_cache.store(key, (("team", "1"),), "Statistiques principales pour l'équipe Paris Saint-Germain")
+    assert bigBoy.answer_cache.get(key) is not None
+    competitor_row(stub, 1)["abbreviation"] = "PSGFC"
+    stub.touch()
+    sync.refresh(force=True)
+    assert bigBoy.answer_cache.get(key) is None
+
+def test_unreachable_api_backs_off():
+    # Port fermé : l'échec repousse la prochaine vérification au lieu de retenter à chaque lecture
+    sync = bigBoy.ReferenceDataSync("http://127.0.0.1:9")
+    assert sync.refresh() == {"competitors": 0, "seasons": 0}
+    assert sync.refresh() == {}
+    assert sync.team_id("PSG") is None
+
+def test_player_refresh_swaps_dicts(stub, sync, monkeypatch):
+    # Même principe pour l'index des joueurs : search() peut tenir les anciens dicts pendant un rechargement
+    monkeypatch.setattr(bigBoy, "reference_data", sync)
+    index = bigBoy.PlayerIndex(stub.url)
+    index.refresh(force=True)
+    special_id = index.search("mbappe")[0]["special_id"]
+    players, season_of = index.players, index.season_of
+    stub.fixture["players"] = [p for p in stub.fixture["players"] if p["special_id"] != special_id]
+    stub.touch()
+    index.refresh(force=True)
+    assert special_id in players and special_id in season_of
+    assert special_id not in index.players
+    assert index.search("mbappe") == []